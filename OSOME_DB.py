@@ -17,6 +17,12 @@ Config File (json) :
     - > Date Created
     - > List of collections
     - > enc
+    - > STORAGE (default storage of new collections : blob / log / paged / mmap)
+    - > CODEC , COMPRESSION (default codec / compression of the collections)
+    - > FSYNC , FSYNC_BATCH , FSYNC_INTERVAL (when writes are fsynced)
+    - > WORKERS , POOL (pool of the DB wide operations)
+    - > PASS_ITERATIONS (PBKDF2 cost of new PassBin hashes)
+    - > collection_options (per collection storage , codec , compression , indexes , page_docs)
 
     Eg : {"DB_NAME":"A","CREATED":"","COLLECTIONS":["A","B","C"],"ENC":false}
 PassBin (json):
@@ -29,17 +35,966 @@ Features :
 """
 
 
+import io
 import os
-import sty
+import sys
+import mmap
+import array
 import json
+import codecs
 import zlib
 import base64
+import bisect
+import struct
 import hashlib
+import hmac
 import datetime
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import threading
+import time
+import copy
+import weakref
+import marshal
+import contextlib
+import functools
+import itertools
+import logging
+import atexit
+# cryptography , asyncio , concurrent.futures , pickle , secrets , lzma and bz2 are imported where they are
+# first needed : a DB without ENC , pools , asyncio or those codecs / compressions never loads them
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (eg : Windows) , the locks only work inside one process
+    fcntl = None
+
+
+# Silent unless the application configures logging (eg : logging.basicConfig(level=logging.INFO))
+logger = logging.getLogger("OSOME_DB")
+logger.addHandler(logging.NullHandler())
+# Operations slower than the threshold given to OsomeDB.enable_metrics , with their stage breakdown
+slow_logger = logging.getLogger("OSOME_DB.slow")
+
+
+# Log storage : MAGIC , then records of HEADER(op , position , payload length , payload CRC32) + payload
+# (position is only used by delete / replace records). A record failing its CRC ends the log (torn append)
+LOG_MAGIC = b"OSLOG\x02"
+LOG_HEADER = struct.Struct(">BIII")
+LOG_INSERT = 1
+LOG_DELETE = 2
+LOG_REPLACE = 3
+# Paged storage : MAGIC , the active directory slot (0 / 1) , two directory slots SLOT(offset , length , CRC32) ,
+# then pages and directories. A directory is ENTRY(offset , length , docs , CRC32) per page , every page is one
+# encrypted/compressed JSON array. Writes append the new pages and directory , fill the inactive slot and
+# flip the active byte , so the old directory stays valid until the flip (and is used if the new one is torn)
+PAGE_MAGIC = b"OSPAG\x02"
+PAGE_SLOT = struct.Struct(">QII")
+PAGE_ENTRY = struct.Struct(">QIII")
+PAGE_HEADER_SIZE = len(PAGE_MAGIC) + 1 + 2 * PAGE_SLOT.size
+# Default docs per page (collection_options[collection]["page_docs"])
+PAGE_DOCS = 128
+# Paged files with more dead bytes than this (and than live ones) get compacted after a write
+PAGE_COMPACT_MIN_DEAD = 1 << 20
+# mmap storage (unencrypted , uncompressed) : MAGIC padded to 8 bytes , the serialized docs back to back ,
+# the offset table (count + 1 little endian uint64 , 8 byte aligned) , TRAILER(table offset , count).
+# Files are only replaced whole , so a mapping stays valid while it is read
+MMAP_MAGIC = b"OSMAP\x01"
+MMAP_HEADER = MMAP_MAGIC.ljust(8, b"\x00")
+MMAP_TRAILER = struct.Struct("<QQ")
+STORAGE_FORMATS = ("blob", "log", "paged", "mmap")
+# Serialization of the docs. JSON payloads are untagged , the others start with their tag byte
+# (JSON text never does) so a payload always tells how to decode it. marshal / pickle are for trusted
+# setups only : anyone able to write the collection files could run code through them
+CODECS = ("json", "msgpack", "marshal", "pickle")
+CODEC_TAGS = {"msgpack": b"\x01", "marshal": b"\x02", "pickle": b"\x03"}
+# Packed payloads : MAGIC , a flags byte (compression id | PACK_ENCRYPTED) , the body. Payloads written
+# before never start with a NUL byte (zlib , JSON , Fernet tokens , codec tags) and are still read.
+# The body is compressed first , then encrypted (Fernet tokens are stored base64 decoded)
+PACK_MAGIC = b"\x00"
+PACK_ENCRYPTED = 0x10
+COMPRESSIONS = {"none": 0, "zlib": 1, "lzma": 2, "bz2": 3}
+# Payloads smaller than this are not compressed , bigger ones only if a sample of them shrinks
+COMPRESS_MIN = 64
+COMPRESS_SAMPLE = 4096
+FSYNC_POLICIES = ("always", "batch", "never")
+# Defaults of FSYNC_BATCH (writes) and FSYNC_INTERVAL (seconds) , a batch is synced when either is reached
+FSYNC_BATCH = 32
+FSYNC_INTERVAL = 1.0
+# Logs with more dead records than this (and than live ones) get compacted when loaded
+LOG_COMPACT_MIN_DEAD = 256
+
+
+# Auxiliary files kept next to a collection (".<collection><suffix>")
+INDEX_SUFFIX = ".idx"
+META_SUFFIX = ".meta"
+AUX_SUFFIXES = (INDEX_SUFFIX, META_SUFFIX)
+# Bumped when the form of the indexed values changes , older index files are rebuilt
+INDEX_VERSION = 2
+# Lock files (".<collection / config.json>.lock") , never removed : a process may be waiting on them
+LOCK_SUFFIX = ".lock"
+# Bytes read at a time when streaming a collection
+STREAM_CHUNK = 1 << 16
+# Blobs up to this size are decoded in one go (faster than streaming them)
+STREAM_MIN = 1 << 22
+
+
+CONFIG_FILE = "config.json"
+# Manifest of a snapshot / backup folder (state and generation of every collection copied)
+BACKUP_MANIFEST = "backup.json"
+# Pools the DB wide operations (total_docs , find_all , export , reencrypt , recompress) can run on
+POOLS = ("process", "thread")
+# Pages of a paged collection handled by one task of a DB wide operation
+PARALLEL_PAGES = 16
+# PassBin hashes : "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>" , PASS_ITERATIONS in config.json sets the cost
+PASS_SCHEME = "pbkdf2_sha256"
+PASS_ITERATIONS = 100000
+PASS_SALT_BYTES = 16
+
+
+# Derived Fernet objects , keyed by (DB path , sha256 of the password)
+_KEY_CACHE = {}
+_KEY_CACHE_LOCK = threading.Lock()
+
+
+def clear_key_cache(db_path=None):
+    """
+    Wipes the derived keys from memory
+    :param db_path: Path to the DB (None wipes the keys of every DB)
+    :return: None
+    """
+    with _KEY_CACHE_LOCK:
+        if db_path is None:
+            _KEY_CACHE.clear()
+        else:
+            db_path = os.path.abspath(db_path)
+            for e in [e for e in _KEY_CACHE if e[0] == db_path]:
+                del _KEY_CACHE[e]
+
+
+
+class RWLock:
+    """
+    Many readers or one writer. The writing thread can read and write again (re-entrant),
+    a reading thread can read again but can not upgrade to writing.
+    Waiting writers go before new readers.
+    With a lock file , the process also holds a shared (readers) or exclusive (writer) flock on it ,
+    so other processes using the same DB are kept out too.
+    """
+    def __init__(self, path=None):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = {}
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self.path = path
+        self._fd = None
+        self._fd_pid = None
+
+
+    def _file_lock(self, operation):
+        """
+        flocks the lock file , called with the condition held
+        :param operation: "LOCK_SH" / "LOCK_EX" / "LOCK_UN"
+        """
+        if self.path is None or fcntl is None:
+            return
+        operation = getattr(fcntl, operation)
+        if operation == fcntl.LOCK_UN:
+            if self._fd is not None and self._fd_pid == os.getpid():
+                fcntl.flock(self._fd, operation)
+            return
+        if self._fd is not None and (self._fd_pid != os.getpid() or not os.path.exists(self.path)):
+            # A forked process opens its own file (a shared descriptor would share the lock) ,
+            # a lock file removed with its DB is made again
+            if self._fd_pid == os.getpid():
+                os.close(self._fd)
+            self._fd = None
+        if self._fd is None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except FileNotFoundError:
+                # The DB folder is not made yet , nobody else can be using it
+                return
+            self._fd_pid = os.getpid()
+        fcntl.flock(self._fd, operation)
+
+
+    def acquire_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                if not self._readers:
+                    self._file_lock("LOCK_SH")
+            self._readers[me] = self._readers.get(me, 0) + 1
+
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            self._readers[me] -= 1
+            if not self._readers[me]:
+                del self._readers[me]
+                if not self._readers and self._writer is None:
+                    self._file_lock("LOCK_UN")
+                self._cond.notify_all()
+
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if me in self._readers:
+                raise RuntimeError("Error : A read lock can not be upgraded to a write lock")
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._file_lock("LOCK_EX")
+            self._writer = me
+            self._writer_depth = 1
+
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._file_lock("LOCK_UN")
+                self._cond.notify_all()
+
+
+    @contextlib.contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+
+    @contextlib.contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+
+# One RWLock per (DB path , collection / config.json) for the whole process
+_LOCKS = {}
+_LOCKS_LOCK = threading.Lock()
+
+
+def get_lock(db_path, name):
+    """
+    The process wide reader/writer lock of a collection (or of config.json)
+    :param db_path: Path to the DB
+    :param name: Collection name / "config.json"
+    :return: RWLock
+    """
+    key = (os.path.abspath(db_path), name)
+    lock = _LOCKS.get(key)
+    if lock is None:
+        with _LOCKS_LOCK:
+            lock = _LOCKS.setdefault(key, RWLock(os.path.join(key[0], f".{name}{LOCK_SUFFIX}")))
+    return lock
+
+
+def temp_file_owner_alive(file_name):
+    """
+    Checks if the process that made a temp file of atomic_write (".<name>.<pid>-<thread>.tmp") still runs
+    :param file_name: Name of the file
+    :return: True / False (False for files that are not such temp files)
+    """
+    if not (file_name.startswith(".") and file_name.endswith(".tmp")):
+        return False
+    try:
+        pid = int(file_name[:-len(".tmp")].rsplit(".", 1)[1].split("-")[0])
+    except (IndexError, ValueError):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+
+def fsync_dir(path):
+    """
+    Makes a rename / new file in a directory durable (no-op where directories can't be opened)
+    :param path: Directory
+    :return: None
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data, fsync=True, fsync_directory=True):
+    """
+    Writes a file through a temp file and os.replace , readers see the old or the new file , never a partial one
+    :param path: File path
+    :param data: Bytes
+    :param fsync: fsync the temp file before the rename , and the directory after it
+    :param fsync_directory: False leaves the directory to the caller (the rename is durable once it is fsynced)
+    :return: None
+    """
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as tmp_file:
+            tmp_file.write(data)
+            if fsync:
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fsync and fsync_directory:
+        fsync_dir(directory)
+
+
+class ConfigFile:
+    """
+    config.json of a DB , kept in memory and read again only when the file changes (mtime / size / inode).
+    Writes bump VERSION and go through atomic_write , so a crash leaves the old or the new config.
+    """
+    def __init__(self, db_path):
+        self.db_path = os.path.abspath(db_path)
+        self.path = os.path.join(self.db_path, CONFIG_FILE)
+        self.lock = get_lock(self.db_path, CONFIG_FILE)
+        self._data = None
+        self._state = None
+
+
+    def _file_state(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+    def get(self):
+        """
+        The cached settings , shared : do not modify them
+        :return: Settings
+        """
+        with self.lock.read():
+            state = self._file_state()
+            if state != self._state:
+                with open(self.path, "rb") as config_fle:
+                    data = json.loads(config_fle.read())
+                self._data, self._state = data, state
+            return self._data
+
+
+    def read(self):
+        """
+        :return: A copy of the settings , free to modify
+        """
+        return copy.deepcopy(self.get())
+
+
+    def version(self):
+        """
+        :return: The VERSION counter , bumped on every write
+        """
+        return self.get().get("VERSION", 0)
+
+
+    def write(self, settings):
+        """
+        Atomically replaces config.json
+        :param settings: New Settings
+        :return: None
+        """
+        with self.lock.write():
+            settings = copy.deepcopy(settings)
+            try:
+                settings["VERSION"] = self.version() + 1
+            except (OSError, ValueError):
+                settings["VERSION"] = settings.get("VERSION", 0) + 1
+            atomic_write(self.path, json.dumps(settings).encode())
+            self._data, self._state = settings, self._file_state()
+
+
+# The cached config.json of every DB , by absolute path
+_CONFIGS = {}
+
+
+def _after_fork():
+    """
+    A forked child gets fresh locks : the ones it inherited may be held by parent threads that do not exist in it
+    """
+    global _LOCKS_LOCK, _KEY_CACHE_LOCK
+    _LOCKS_LOCK = threading.Lock()
+    _KEY_CACHE_LOCK = threading.Lock()
+    for lock in _LOCKS.values():
+        if lock._fd is not None:
+            # The parent's flocks stay with the parent
+            os.close(lock._fd)
+    _LOCKS.clear()
+    _CONFIGS.clear()
+    for db in list(_DBS.values()):
+        db._sync_lock = threading.Lock()
+        db._sync_timer = None
+    for handle in list(_DIRTY_HANDLES.values()):
+        # The parent flushes its own cached docs
+        handle._cache_lock = threading.RLock()
+        handle._flush_timer = None
+    _DIRTY_HANDLES.clear()
+
+
+def get_config(db_path):
+    """
+    The ConfigFile of a DB , shared by every OsomeDB , Collection and Settings obj of the process
+    :param db_path: Path to the DB
+    :return: ConfigFile
+    """
+    key = os.path.abspath(db_path)
+    config = _CONFIGS.get(key)
+    if config is None:
+        config = ConfigFile(key)
+        with _LOCKS_LOCK:
+            config = _CONFIGS.setdefault(key, config)
+    return config
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise Exception("Error : The msgpack codec needs msgpack (pip install msgpack)")
+    return msgpack
+
+
+def encode_payload(obj, codec="json"):
+    """
+    Serializes docs
+    :param obj: Docs (or one doc)
+    :param codec: "json" / "msgpack" / "marshal" / "pickle"
+    :return: Bytes
+    """
+    if codec == "json":
+        return json.dumps(obj, separators=(",", ":")).encode()
+    if codec == "msgpack":
+        return CODEC_TAGS[codec] + _msgpack().packb(obj, use_bin_type=True)
+    if codec == "marshal":
+        return CODEC_TAGS[codec] + marshal.dumps(obj)
+    if codec == "pickle":
+        import pickle
+        return CODEC_TAGS[codec] + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    raise Exception(f"Error : Unknown codec `{codec}`")
+
+
+def decode_payload(raw):
+    """
+    Reverses encode_payload , the codec is read from the payload
+    :param raw: Bytes
+    :return: Docs (or one doc)
+    """
+    tag = bytes(raw[:1])
+    if tag == CODEC_TAGS["msgpack"]:
+        return _msgpack().unpackb(memoryview(raw)[1:], raw=False, strict_map_key=False)
+    if tag == CODEC_TAGS["marshal"]:
+        return marshal.loads(memoryview(raw)[1:])
+    if tag == CODEC_TAGS["pickle"]:
+        import pickle
+        return pickle.loads(memoryview(raw)[1:])
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    return json.loads(raw)
+
+
+def parse_compression(compression):
+    """
+    :param compression: "none" / "zlib" / "lzma" / "bz2" , with an optional level (eg : "zlib:9" , "lzma:1")
+    :return: Name , level (None for the default)
+    """
+    name, _, level = str(compression).partition(":")
+    if name not in COMPRESSIONS:
+        raise Exception(f"Error : Unknown compression `{compression}`")
+    return name, int(level) if level else None
+
+
+def compress_payload(data, compression="zlib"):
+    """
+    Compresses bytes , skipping small payloads and the ones a sample shows do not compress
+    :param data: Bytes
+    :param compression: See parse_compression
+    :return: The compression id used , bytes
+    """
+    name, level = parse_compression(compression)
+    if name == "none" or len(data) < COMPRESS_MIN:
+        return COMPRESSIONS["none"], data
+    if len(data) > 4 * COMPRESS_SAMPLE:
+        sample = data[:COMPRESS_SAMPLE]
+        if len(zlib.compress(sample, 1)) > 0.9 * len(sample):
+            return COMPRESSIONS["none"], data
+    if name == "zlib":
+        packed = zlib.compress(data, -1 if level is None else level)
+    elif name == "lzma":
+        import lzma
+        packed = lzma.compress(data, preset=6 if level is None else level)
+    else:
+        import bz2
+        packed = bz2.compress(data, 9 if level is None else level)
+    if len(packed) >= len(data):
+        return COMPRESSIONS["none"], data
+    return COMPRESSIONS[name], packed
+
+
+def decompress_payload(compression_id, data):
+    """
+    Reverses compress_payload
+    :param compression_id: The id compress_payload returned
+    :param data: Bytes
+    :return: Bytes
+    """
+    if compression_id == COMPRESSIONS["none"]:
+        return data
+    if compression_id == COMPRESSIONS["zlib"]:
+        return zlib.decompress(data)
+    if compression_id == COMPRESSIONS["lzma"]:
+        import lzma
+        return lzma.decompress(data)
+    if compression_id == COMPRESSIONS["bz2"]:
+        import bz2
+        return bz2.decompress(data)
+    raise Exception(f"Error : Unknown compression id `{compression_id}`")
+
+
+def _decompressor(compression_id):
+    """
+    Incremental decompression
+    :return: Function(chunk) -> bytes , function() -> the bytes left at the end
+    """
+    if compression_id == COMPRESSIONS["zlib"]:
+        decompress = zlib.decompressobj()
+        return decompress.decompress, decompress.flush
+    if compression_id == COMPRESSIONS["lzma"]:
+        import lzma
+        return lzma.LZMADecompressor().decompress, bytes
+    if compression_id == COMPRESSIONS["bz2"]:
+        import bz2
+        return bz2.BZ2Decompressor().decompress, bytes
+    return bytes, bytes
+
+
+class ConflictError(Exception):
+    """
+    A compare-and-swap write found the doc changed since its version was read
+    """
+
+
+def doc_version(doc):
+    """
+    The version of a doc : a hash of its content , so it changes with the doc and only with it
+    :param doc: Doc
+    :return: Version (hex string)
+    """
+    data = json.dumps(doc, sort_keys=True, separators=(",", ":"), default=repr).encode()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+_MISSING = object()
+
+
+def _index_normal(val):
+    """
+    The form of a value in the indexes : bools and whole floats as ints , down lists and dicts
+    """
+    if isinstance(val, bool) or (isinstance(val, float) and val.is_integer()):
+        return int(val)
+    if isinstance(val, list):
+        return [_index_normal(e) for e in val]
+    if isinstance(val, dict):
+        return {key: _index_normal(e) for key, e in val.items()}
+    return val
+
+
+def _compare(op, value, operand):
+    if op == "$eq":
+        return value is not _MISSING and value == operand
+    if op == "$ne":
+        return value is _MISSING or value != operand
+    if op == "$in":
+        return value is not _MISSING and value in operand
+    if op == "$nin":
+        return value is _MISSING or value not in operand
+    if op == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if value is _MISSING:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise Exception(f"Error : Unknown operator `{op}`")
+
+
+def match_filter(doc, query):
+    """
+    Checks a doc against a filter
+    Eg : {"Class":5 , "Age":{"$gte":10,"$lt":15} , "Id":{"$in":["1","2"]} , "$or":[{...},{...}]}
+    Operators : $eq $ne $in $nin $gt $gte $lt $lte $exists , and $and / $or of filters
+    :param doc: Doc
+    :param query: Filter (None / {} matches every doc)
+    :return: True / False
+    """
+    if not query:
+        return True
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(match_filter(doc, e) for e in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_filter(doc, e) for e in cond):
+                return False
+            continue
+        value = doc.get(key, _MISSING) if isinstance(doc, dict) else _MISSING
+        if isinstance(cond, dict) and cond and all(str(e).startswith("$") for e in cond):
+            if not all(_compare(op, value, operand) for op, operand in cond.items()):
+                return False
+        elif not _compare("$eq", value, cond):
+            return False
+    return True
+
+
+def project(doc, projection):
+    """
+    Keeps (or drops) keys of a doc
+    :param doc: Doc
+    :param projection: None , [keys to keep] , {key : 1} to keep or {key : 0} to drop
+    :return: Doc
+    """
+    if projection is None or not isinstance(doc, dict):
+        return doc
+    if not isinstance(projection, dict):
+        projection = dict.fromkeys(projection, 1)
+    if any(projection.values()):
+        return {key: doc[key] for key in projection if projection[key] and key in doc}
+    return {key: val for key, val in doc.items() if key not in projection}
+
+
+def sort_docs(docs, sort):
+    """
+    Sorts docs , docs missing a key go first
+    :param docs: Docs
+    :param sort: "key" , [("key" , 1 / -1) ...] or {"key" : 1 / -1}
+    :return: Sorted docs (list)
+    """
+    if isinstance(sort, str):
+        sort = [(sort, 1)]
+    elif isinstance(sort, dict):
+        sort = list(sort.items())
+    docs = list(docs)
+    # Stable sorts , least significant key first
+    for key, direction in reversed(sort):
+        def sort_key(doc):
+            value = doc.get(key, _MISSING) if isinstance(doc, dict) else _MISSING
+            return (0, 0) if value is _MISSING else (1, value)
+        try:
+            docs.sort(key=sort_key, reverse=direction < 0)
+        except TypeError:
+            raise Exception(f"Error : Values of `{key}` can not be compared")
+    return docs
+
+
+# Decoders of the pool workers , by (DB path , ENC)
+_WORKER_DBS = {}
+
+
+def _worker_db(db_path, enc):
+    """
+    A bare OsomeDB used by pool workers to decode / encode collection files. It never opens the DB
+    (no renew_db , no locks) : the task functions only read files , the caller commits what they return
+    """
+    db = _WORKER_DBS.get((db_path, enc))
+    if db is None:
+        db = OsomeDB.__new__(OsomeDB)
+        db.db_path = db_path
+        db.db_name = os.path.basename(db_path)
+        db._enc = enc
+        db._mmaps = {}
+        db._indexes = {}
+        db._logs = {}
+        db._metrics = None
+        _WORKER_DBS[(db_path, enc)] = db
+    return db
+
+
+def _count_task(db_path, enc, collection):
+    db = _worker_db(db_path, enc)
+    with open(db.collection_path(collection), "rb") as db_file:
+        return sum(1 for e in db._iter_file(db_file))
+
+
+def _find_task(db_path, enc, collection, query, projection, entries=None):
+    db = _worker_db(db_path, enc)
+    with open(db.collection_path(collection), "rb") as db_file:
+        return [project(e, projection) for e in db._iter_file(db_file, entries=entries) if match_filter(e, query)]
+
+
+def _export_task(db_path, enc, collection, dest):
+    db = _worker_db(db_path, enc)
+    with open(db.collection_path(collection), "rb") as db_file:
+        docs = list(db._iter_file(db_file))
+    atomic_write(os.path.join(dest, f"{collection}.json"), json.dumps(docs).encode(), fsync=False)
+    return len(docs)
+
+
+def _repack_task(db_path, enc, new_enc, collection, entries=None, compression="zlib"):
+    """
+    Decodes a collection file (or some pages of it) with ENC and packs it again with new_enc and
+    compression , the docs are not parsed
+    :return: The new file (blob / log) , or [(page , docs)] for paged entries
+    """
+    old = _worker_db(db_path, enc)
+    new = _worker_db(db_path, new_enc)
+    with open(old.collection_path(collection), "rb") as db_file:
+        if entries is not None:
+            pages = []
+            for entry in entries:
+                pages.append((new.pack_data(old.unpack_data(old._page_raw(db_file, entry)),compression), entry[2]))
+            return pages
+        raw_data = db_file.read()
+    if raw_data.startswith(MMAP_MAGIC):
+        # Stored as it is , never encrypted nor compressed
+        return raw_data
+    if raw_data.startswith(LOG_MAGIC):
+        records = [LOG_MAGIC]
+        for index, (a, b) in enumerate(old._log_scan(raw_data)[0]):
+            payload = new.pack_data(old.unpack_data(raw_data[a:b]),compression)
+            records.append(LOG_HEADER.pack(LOG_INSERT, index, len(payload), zlib.crc32(payload)) + payload)
+        return b"".join(records)
+    return new.pack_data(old.unpack_data(raw_data),compression)
+
+
+# Upper bounds (seconds) of the buckets of the stage timings
+METRIC_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Metrics:
+    """
+    Counters and timing histograms of a DB , per stage and collection. Off unless OsomeDB.enable_metrics is called.
+    Stages : read , decrypt , decompress , parse (loads) , serialize , compress , encrypt , write (writes) , kdf
+    Counters : bytes_read , bytes_written , key_cache_hits / misses , mmap_cache_hits / misses ,
+    passbin_cache_hits / misses
+    With slow_threshold set , operations (see traced) taking longer are logged with their stage breakdown
+    """
+    def __init__(self,slow_threshold=None):
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.counters = {}
+        self.hooks = []
+        self.slow_threshold = slow_threshold
+        # Stage times of the operation running in each thread , for the slow operation log
+        self._op = threading.local()
+
+
+    def add_hook(self,hook):
+        """
+        Calls hook(name , collection , value) on every record (value : seconds for a stage , the increment for a counter)
+        :param hook: Function
+        :return: None
+        """
+        self.hooks.append(hook)
+
+
+    def observe(self,stage,collection,seconds):
+        """
+        Records the time a stage took
+        :param stage: Stage name
+        :param collection: Collection name (None when it is not known)
+        :param seconds: Time taken
+        :return: None
+        """
+        key = (stage, collection or "")
+        with self._lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = {"count": 0, "sum": 0.0, "buckets": [0] * len(METRIC_BUCKETS)}
+            timing["count"] += 1
+            timing["sum"] += seconds
+            index = bisect.bisect_left(METRIC_BUCKETS, seconds)
+            if index < len(METRIC_BUCKETS):
+                timing["buckets"][index] += 1
+        stages = getattr(self._op, "stages", None)
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + seconds
+        for hook in self.hooks:
+            hook(stage, collection, seconds)
+
+
+    def run_op(self,name,collection,fn,*args,**kwargs):
+        """
+        Runs an operation , logging it to OSOME_DB.slow if it took slow_threshold seconds or more.
+        Operations called by another one are part of it
+        :param name: Operation name
+        :param collection: Collection name (None when there is none)
+        :param fn: Function
+        :return: What fn returned
+        """
+        if getattr(self._op, "stages", None) is not None:
+            return fn(*args, **kwargs)
+        self._op.stages = {}
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stages, self._op.stages = self._op.stages, None
+            threshold = self.slow_threshold
+            if threshold is not None and elapsed >= threshold and slow_logger.isEnabledFor(logging.WARNING):
+                breakdown = " , ".join(f"{stage} {seconds:.4f} s" for stage, seconds in sorted(stages.items(), key=lambda e: -e[1]))
+                slow_logger.warning("Slow %s on `%s` : %.4f s (%s)", name, collection, elapsed, breakdown or "no stage recorded")
+
+
+    def count(self,name,collection=None,value=1):
+        """
+        Adds to a counter
+        :param name: Counter name
+        :param collection: Collection name (None when it is not known)
+        :param value: Increment
+        :return: None
+        """
+        key = (name, collection or "")
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        for hook in self.hooks:
+            hook(name, collection, value)
+
+
+    def reset(self):
+        with self._lock:
+            self.timings = {}
+            self.counters = {}
+
+
+    def snapshot(self):
+        """
+        :return: {"timings" : {stage : {collection : {"count" , "sum" , "buckets" : {le : cumulative count}}}} ,
+                  "counters" : {name : {collection : value}}}
+        """
+        with self._lock:
+            timings = copy.deepcopy(self.timings)
+            counters = dict(self.counters)
+        result = {"timings": {}, "counters": {}}
+        for (stage, collection), timing in sorted(timings.items()):
+            cumulative = list(itertools.accumulate(timing["buckets"]))
+            buckets = {str(le): e for le, e in zip(METRIC_BUCKETS, cumulative)}
+            buckets["+Inf"] = timing["count"]
+            result["timings"].setdefault(stage, {})[collection] = {"count": timing["count"], "sum": timing["sum"], "buckets": buckets}
+        for (name, collection), value in sorted(counters.items()):
+            result["counters"].setdefault(name, {})[collection] = value
+        return result
+
+
+    def to_prometheus(self):
+        """
+        The metrics in the Prometheus text format
+        :return: Text
+        """
+        snapshot = self.snapshot()
+        label = lambda e: str(e).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        lines = []
+        if snapshot["timings"]:
+            lines.append("# HELP osomedb_stage_seconds Time spent per stage of the collection reads and writes")
+            lines.append("# TYPE osomedb_stage_seconds histogram")
+        for stage, collections in snapshot["timings"].items():
+            for collection, timing in collections.items():
+                labels = f'stage="{label(stage)}",collection="{label(collection)}"'
+                for le, value in timing["buckets"].items():
+                    lines.append(f'osomedb_stage_seconds_bucket{{{labels},le="{le}"}} {value}')
+                lines.append(f"osomedb_stage_seconds_sum{{{labels}}} {timing['sum']}")
+                lines.append(f"osomedb_stage_seconds_count{{{labels}}} {timing['count']}")
+        for name, collections in snapshot["counters"].items():
+            lines.append(f"# TYPE osomedb_{name}_total counter")
+            for collection, value in collections.items():
+                lines.append(f'osomedb_{name}_total{{collection="{label(collection)}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+    def write_prometheus(self,path):
+        """
+        Writes to_prometheus() to a file (atomically , for the node exporter's textfile collector)
+        :param path: File path
+        :return: None
+        """
+        atomic_write(path, self.to_prometheus().encode(), fsync=False)
+
+
+def traced(fn):
+    """
+    Marks an OsomeDB method as an operation of the slow operation log (see Metrics.run_op) ,
+    a plain call when the metrics or the log are off
+    """
+    @functools.wraps(fn)
+    def wrapper(self,*args,**kwargs):
+        metrics = self.db._metrics
+        if metrics is None or metrics.slow_threshold is None:
+            return fn(self,*args,**kwargs)
+        collection = args[0] if args and isinstance(args[0], str) else None
+        return metrics.run_op(fn.__name__,collection,fn,self,*args,**kwargs)
+    return wrapper
+
+
+# The opened DBs , by absolute path (handles made from a path reuse them)
+_DBS = weakref.WeakValueDictionary()
+
+# DBs with a "batch" of writes not fsynced yet , by id (kept alive until it is)
+_PENDING_SYNC = {}
+
+
+@atexit.register
+def _sync_at_exit():
+    """
+    Syncs the last batch of every DB ("batch" FSYNC policy) , an exiting process would leave it to the OS
+    """
+    for db in list(_PENDING_SYNC.values()):
+        db.sync()
+
+
+# Cached Collection handles with unflushed docs , by id (kept alive until they are flushed)
+_DIRTY_HANDLES = {}
+
+
+@atexit.register
+def _flush_at_exit():
+    """
+    Flushes every cached Collection handle left with unflushed docs. Registered after _sync_at_exit ,
+    so it runs first and the batch its writes make is synced too
+    """
+    for handle in list(_DIRTY_HANDLES.values()):
+        handle.flush()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
 
 
 
@@ -49,20 +1004,68 @@ class OsomeDB:
         If No DB exists in db_path a new one will bw created
         :param db_path: Path to the DB
         """
-        self.db_path = db_path
+        self.db_path = os.path.abspath(db_path)
         self.db_name = str(db_path).split("/")[-1]
         if os.path.exists(db_path):
             if os.path.isdir(db_path):
                 self.renew_db()
-                self.print_info("Renewing  DB")
+                self.print_info("Renewing DB %s", self.db_path)
             else:
                 raise Exception("The DB is not a Dir")
         else:
-            self.print_info("Making New DB")
+            self.print_info("Making New DB %s", self.db_path)
             self.make_new_db()
-        self.db_name = self.get_db_name()
-        self.enc = self.get_settings()["ENC"]
-        self.collections = self.get_db_collections()
+        self._handles = {}
+        self._mmaps = {}
+        self._indexes = {}
+        self._logs = {}
+        self._metrics = None
+        self._sync_lock = threading.Lock()
+        self._pending_sync = set()
+        self._pending_writes = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self._refresh(get_config(self.db_path).read())
+        _DBS[self.db_path] = self
+
+
+    @staticmethod
+    def open(db_path):
+        """
+        Gives the OsomeDB already opened for db_path in this process , or opens it
+        :param db_path: Path to the DB
+        :return: OsomeDB
+        """
+        db = _DBS.get(os.path.abspath(db_path))
+        if db is None:
+            db = OsomeDB(db_path)
+        return db
+
+
+    # Set by the pool workers to decode with a fixed ENC , else ENC follows config.json
+    _enc = None
+
+
+    def _refresh(self,settings):
+        self.db_name = settings["DB_NAME"]
+
+
+    @property
+    def enc(self):
+        """
+        ENC of config.json , read on every access so changes made by other processes are followed
+        """
+        if self._enc is not None:
+            return self._enc
+        return get_config(self.db_path).get()["ENC"]
+
+
+    @property
+    def collections(self):
+        """
+        Collections of config.json , read on every access so changes made by other processes are followed
+        """
+        return list(get_config(self.db_path).get()["collections"])
 
 
     def __str__(self):
@@ -106,40 +1109,72 @@ class OsomeDB:
         :param collection: Name Of the Collection
         :return: True / False
         """
-        past = os.getcwd()
-        try:
-            os.chdir(self.db_path)
-        except:
-            pass
-        result = os.path.exists(collection)
-        try:
-            os.chdir(past)
-        except:
-            pass
-        return result
+        return os.path.exists(self.collection_path(collection))
+
+
+    def collection_path(self,collection):
+        """
+        :param collection: Name Of the Collection
+        :return: Absolute path of the collection file
+        """
+        return os.path.join(self.db_path, collection)
+
+
+    def collection_lock(self,collection):
+        """
+        The reader/writer lock of a collection , shared by every handle of this process
+        :param collection: Name Of the Collection
+        :return: RWLock
+        """
+        return get_lock(self.db_path, collection)
+
+
+    def config_lock(self):
+        """
+        The reader/writer lock of config.json
+        :return: RWLock
+        """
+        return get_lock(self.db_path, CONFIG_FILE)
 
 
-    def make_collection(self,collection):
+    def make_collection(self,collection,storage=None,codec=None,compression=None):
         """
         Makes a Collection
         :param collection: Name of the Collection
+        :param storage: "blob" / "log" / "paged" / "mmap" (default : STORAGE in config.json , else "blob")
+        :param codec: "json" / "msgpack" / "marshal" / "pickle" (default : CODEC in config.json , else "json")
+        :param compression: See parse_compression (default : COMPRESSION in config.json , else "zlib")
         :return: None
         """
-        past = os.getcwd()
-        try:
-            os.chdir(self.db_path)
-        except:
-            pass
-        settings = self.get_settings()
-        if not collection in settings["collections"]:
-            new_settings= self.get_settings()
-            new_settings["collections"].append(collection)
-            self.write_settings(new_settings)
-            self.renew_db()
-        try:
-            os.chdir(past)
-        except:
-            pass
+        with self.config_lock().write():
+            settings = self.get_settings()
+            if not collection in settings["collections"]:
+                new_settings= self.get_settings()
+                new_settings["collections"].append(collection)
+                storage = storage or new_settings.get("STORAGE", "blob")
+                if storage not in STORAGE_FORMATS:
+                    raise Exception(f"Error : Unknown storage `{storage}`")
+                if storage == "mmap" and self.enc != False:
+                    raise Exception("Error : mmap collections can not be encrypted")
+                new_settings.setdefault("collection_options", {})[collection] = {"storage": storage}
+                if codec is not None:
+                    if codec not in CODECS:
+                        raise Exception(f"Error : Unknown codec `{codec}`")
+                    if codec == "msgpack":
+                        _msgpack()
+                    new_settings["collection_options"][collection]["codec"] = codec
+                if compression is not None:
+                    parse_compression(compression)
+                    new_settings["collection_options"][collection]["compression"] = compression
+                self.write_settings(new_settings)
+            self._create_collection_file(collection)
+
+
+    def _create_collection_file(self,collection):
+        if not os.path.exists(self.collection_path(collection)):
+            file = open(self.collection_path(collection),"x")
+            file.write(json.dumps([]))
+            file.close()
 
 
     def date_created(self):
@@ -147,17 +1182,144 @@ class OsomeDB:
         The Date when the DB was Created
         :return: Date
         """
-        date = self.get_settings()["CREATED"]
+        date = get_config(self.db_path).get()["CREATED"]
         return date
 
 
-    def get_collection(self,collection):
+    def get_collection(self,collection,cache=False,flush_ops=None,flush_interval=None):
         """
-        Returns a Collection obj
+        Returns a Collection obj , sharing this DB. Plain handles are made once per name , cached ones every call
         :param collection: The Name of the Collection
+        :param cache: Keep the docs in memory and write them back on flush()
+        :param flush_ops: Flush after this many writes (cache mode)
+        :param flush_interval: Flush when this many seconds passed since the last flush (cache mode)
         :return: Collection
         """
-        return Collection(self.db_path,collection)
+        if cache:
+            return Collection(self.db_path,collection,cache=cache,flush_ops=flush_ops,flush_interval=flush_interval,db=self.db)
+        handle = self._handles.get(("collection", collection))
+        if handle is None:
+            handle = self._handles.setdefault(("collection", collection), Collection(self.db_path,collection,db=self.db))
+        return handle
+
+
+    def get_passbin(self,bin_name):
+        """
+        Returns a PassBin obj sharing this DB , made once per name
+        :param bin_name: Name of the passbin
+        :return: PassBin
+        """
+        handle = self._handles.get(("passbin", bin_name))
+        if handle is None:
+            handle = self._handles.setdefault(("passbin", bin_name), OsomeDB.PassBin(self.db_path,bin_name,db=self.db))
+        return handle
+
+
+    @property
+    def db(self):
+        """
+        The OsomeDB the handle belongs to (itself for an OsomeDB)
+        """
+        return self
+
+
+    def enable_metrics(self,hook=None,slow_threshold=None):
+        """
+        Starts recording per stage timings and counters for this DB (and every handle sharing it).
+        Pool workers of the DB wide operations do not report to it
+        :param hook: Optional function , see Metrics.add_hook
+        :param slow_threshold: Seconds , operations taking longer are logged to OSOME_DB.slow with their stages
+        :return: Metrics
+        """
+        db = self.db
+        if db._metrics is None:
+            db._metrics = Metrics()
+        if slow_threshold is not None:
+            db._metrics.slow_threshold = slow_threshold
+        if hook is not None:
+            db._metrics.add_hook(hook)
+        return db._metrics
+
+
+    def disable_metrics(self):
+        """
+        Stops recording metrics
+        :return: The Metrics recorded so far (None if they were off)
+        """
+        metrics, self.db._metrics = self.db._metrics, None
+        return metrics
+
+
+    def get_metrics(self):
+        """
+        :return: Metrics , None when they are off
+        """
+        return self.db._metrics
+
+
+    @contextlib.contextmanager
+    def _timed_stage(self,metrics,stage,collection):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            metrics.observe(stage, collection, time.perf_counter() - start)
+
+
+    def _stage(self,stage,collection):
+        """
+        Times a stage when metrics are on
+        :param stage: Stage name (see Metrics)
+        :param collection: Collection name
+        :return: Context manager
+        """
+        metrics = self.db._metrics
+        if metrics is None:
+            return contextlib.nullcontext()
+        return self._timed_stage(metrics,stage,collection)
+
+
+    def _read(self,db_file,collection,length=-1):
+        """
+        Reads from a collection file , timed as "read" and counted in bytes_read
+        :param db_file: Open file (binary)
+        :param collection: Collection name
+        :param length: Bytes to read (default : up to the end)
+        :return: Bytes
+        """
+        if self.db._metrics is None:
+            return db_file.read(length)
+        with self._stage("read",collection):
+            data = db_file.read(length)
+        self.db._metrics.count("bytes_read", collection, len(data))
+        return data
+
+
+    def _parse(self,payload,collection):
+        """
+        decode_payload , timed as "parse" (a mapped slice is counted in bytes_read as it is read then)
+        :param payload: Serialized docs (bytes / memoryview)
+        :param collection: Collection name
+        :return: Docs
+        """
+        if self.db._metrics is None:
+            return decode_payload(payload)
+        if isinstance(payload, memoryview):
+            self.db._metrics.count("bytes_read", collection, len(payload))
+        with self._stage("parse",collection):
+            return decode_payload(payload)
+
+
+    def _serialize(self,data,codec,collection):
+        """
+        encode_payload , timed as "serialize"
+        :param data: Docs
+        :param codec: Codec
+        :param collection: Collection name
+        :return: Bytes
+        """
+        with self._stage("serialize",collection):
+            return encode_payload(data, codec)
 
 
     def remove_collection(self,collection):
@@ -166,55 +1328,406 @@ class OsomeDB:
         :param collection:  Name of the collection
         :return: None
         """
-        past = os.getcwd()
-        try:
-            os.chdir(self.db_path)
-        except:
-            pass
-        self.write_settings(self.get_settings()["collections"].remove(collection))
-        self.renew_db()
-        try:
-            os.chdir(past)
-        except:
-            pass
+        with self.config_lock().write():
+            settings = self.get_settings()
+            settings["collections"].remove(collection)
+            settings.get("collection_options", {}).pop(collection, None)
+            self.write_settings(settings)
+        with self.collection_lock(collection).write():
+            for e in os.listdir(self.db_path):
+                if e == collection or self.is_aux_file(e, [collection]):
+                    os.remove(os.path.join(self.db_path, e))
+        self._handles.pop(("collection", collection), None)
+        self._handles.pop(("passbin", collection), None)
 
 
     def total_collections(self):
         """
         :return: The Total Count of Collections
         """
-        return len(self.get_settings()["collections"])
+        return len(get_config(self.db_path).get()["collections"])
 
 
-    def total_docs(self):
+    @traced
+    def total_docs(self,workers=None,pool=None):
         """
+        Counts come from the collections' metadata , the collections without an up to date one
+        are counted here (or in parallel when workers / pool is given)
+        :param workers: Pool size
+        :param pool: "thread" / "process"
         :return: Returns Total Number of Docs in the DB
         """
         total_len = 0
+        stale = {}
         for e in self.collections:
-            total_len += len(self.load_collection(e))
+            meta = self._load_meta(e)
+            if meta is not None:
+                total_len += meta["count"]
+            else:
+                stale[e] = self._collection_state(e)
+        if not stale:
+            return total_len
+        if workers is None and pool is None:
+            return total_len + sum(self.count_docs(e) for e in stale)
+        with self._executor(workers,pool) as executor:
+            counts = {e: executor.submit(_count_task, self.db_path, self.enc, e) for e in stale}
+            for e, future in counts.items():
+                count = future.result()
+                total_len += count
+                with self.collection_lock(e).read():
+                    if self._collection_state(e) == stale[e]:
+                        self._save_meta(e,count,bump=False)
         return total_len
 
 
+    def _executor(self,workers=None,pool=None,heavy=False):
+        """
+        The pool of a DB wide operation. Process pools are opt-in : pool="process" , or POOL="process"
+        in config.json for the heavy jobs (reencrypt , recompress)
+        :param workers: Pool size (default : WORKERS in config.json , else the number of CPUs)
+        :param pool: "process" / "thread" (default : "thread")
+        :param heavy: The job decodes and encodes every collection
+        :return: Executor
+        """
+        settings = get_config(self.db_path).get()
+        workers = workers or settings.get("WORKERS") or os.cpu_count() or 1
+        pool = pool or (settings.get("POOL") if heavy else None) or "thread"
+        import concurrent.futures
+        if pool == "process":
+            return concurrent.futures.ProcessPoolExecutor(workers)
+        if pool == "thread":
+            return concurrent.futures.ThreadPoolExecutor(workers)
+        raise Exception(f"Error : Unknown pool `{pool}`")
+
+
+    def _chunks(self,collection):
+        """
+        How a DB wide operation splits a collection : PARALLEL_PAGES pages per task for paged
+        collections , the whole file for the others
+        :param collection: Collection Name
+        :return: [pages of the chunk (None for the whole file)]
+        """
+        with self.collection_lock(collection).read():
+            with open(self.collection_path(collection), "rb") as db_file:
+                if db_file.read(len(PAGE_MAGIC)) != PAGE_MAGIC:
+                    return [None]
+                entries = self._page_directory(db_file)[0]
+        return [entries[e:e + PARALLEL_PAGES] for e in range(0, len(entries), PARALLEL_PAGES)]
+
+
+    @traced
+    def find_all(self,filter=None,projection=None,collections=None,workers=None,pool=None):
+        """
+        Finds the matching docs of every collection , collections (and chunks of paged ones) are
+        searched in parallel. The collections are locked for reading meanwhile
+        :param filter: Filter (see match_filter) , None matches every doc
+        :param projection: None , [keys to keep] , {key : 1} to keep or {key : 0} to drop
+        :param collections: Collections to search (default : all)
+        :param workers: Pool size (default : WORKERS in config.json , else the number of CPUs)
+        :param pool: "thread" / "process" (default : "thread")
+        :return: {collection : docs}
+        """
+        collections = self.collections if collections is None else collections
+        with contextlib.ExitStack() as locks:
+            # The workers open the files themselves , the page chunks stay valid until they are done
+            for e in sorted(collections):
+                locks.enter_context(self.collection_lock(e).read())
+            with self._executor(workers,pool) as executor:
+                tasks = {e: [executor.submit(_find_task, self.db_path, self.enc, e, filter, projection, chunk)
+                             for chunk in self._chunks(e)] for e in collections}
+                return {e: [doc for future in futures for doc in future.result()] for e, futures in tasks.items()}
+
+
+    def export(self,dest,collections=None,workers=None,pool=None):
+        """
+        Writes every collection as plain JSON (dest/<collection>.json) , in parallel
+        :param dest: Folder to write to
+        :param collections: Collections to export (default : all)
+        :param workers: Pool size (default : WORKERS in config.json , else the number of CPUs)
+        :param pool: "thread" / "process" (default : "thread")
+        :return: {collection : number of docs}
+        """
+        collections = self.collections if collections is None else collections
+        dest = os.path.abspath(dest)
+        os.makedirs(dest, exist_ok=True)
+        with self._executor(workers,pool) as executor:
+            tasks = {e: executor.submit(_export_task, self.db_path, self.enc, e, dest) for e in collections}
+            return {e: future.result() for e, future in tasks.items()}
+
+
+    def reencrypt(self,new_enc,workers=None,pool=None):
+        """
+        Rewrites every collection (PassBins too) encrypted with a new password and switches ENC to it ,
+        the collections (and chunks of paged ones) are packed in parallel.
+        The collections are locked for writing meanwhile
+        :param new_enc: New Password , False to store the DB unencrypted
+        :param workers: Pool size (default : WORKERS in config.json , else the number of CPUs)
+        :param pool: "process" / "thread" (default : POOL in config.json , else "thread")
+        :return: None
+        """
+        self._repack(new_enc,workers,pool)
+
+
+    def recompress(self,compression=None,collections=None,workers=None,pool=None):
+        """
+        Packs collections again with their compression (logs lose their dead records) , in parallel
+        :param compression: New compression of the collections (see parse_compression , default : keep theirs)
+        :param collections: Collections to recompress (default : all)
+        :param workers: Pool size (default : WORKERS in config.json , else the number of CPUs)
+        :param pool: "process" / "thread" (default : POOL in config.json , else "thread")
+        :return: None
+        """
+        collections = self.collections if collections is None else collections
+        if compression is not None:
+            parse_compression(compression)
+            with self.config_lock().write():
+                settings = self.get_settings()
+                for e in collections:
+                    settings.setdefault("collection_options", {}).setdefault(e, {})["compression"] = compression
+                self.write_settings(settings)
+        self._repack(self.enc,workers,pool,collections)
+
+
+    def _repack(self,new_enc,workers,pool,collections=None):
+        collections = sorted(self.collections if collections is None else collections)
+        if new_enc != False and any(self.get_storage(e) == "mmap" for e in collections):
+            raise Exception("Error : mmap collections can not be encrypted")
+        with contextlib.ExitStack() as locks:
+            for e in collections:
+                locks.enter_context(self.collection_lock(e).write())
+            indexes = {e: self._load_indexes(e) for e in collections if self.get_indexes(e)}
+            metas = {e: self._load_meta(e) for e in collections}
+            chunks = {e: self._chunks(e) for e in collections}
+            with self._executor(workers,pool,heavy=True) as executor:
+                tasks = {e: [executor.submit(_repack_task, self.db_path, self.enc, new_enc, e, chunk, self.get_compression(e))
+                             for chunk in chunks[e]] for e in collections}
+                packed = {e: [future.result() for future in futures] for e, futures in tasks.items()}
+            for e, parts in packed.items():
+                if chunks[e] == [None]:
+                    self.commit_file(self.collection_path(e),parts[0])
+                else:
+                    self.commit_file(self.collection_path(e),self._page_file([page for part in parts for page in part]))
+            if new_enc != self.enc:
+                with self.config_lock().write():
+                    settings = self.get_settings()
+                    settings["ENC"] = new_enc
+                    self.write_settings(settings)
+                clear_key_cache(self.db_path)
+            for e, key_indexes in indexes.items():
+                self._save_indexes(e,key_indexes)
+            for e, meta in metas.items():
+                self._save_meta(e,meta["count"] if meta is not None else self.count_docs(e))
+
+
+    def snapshot(self,dest):
+        """
+        Copies the DB to dest (a new folder) as it was at one point in time. Writers are only held back while
+        every file is linked or opened , the copying happens after. Blob and mmap collections (only ever replaced
+        whole) are hard linked when dest is on the same file system , log and paged ones (written in place) are
+        copied up to their last commit at that point
+        :param dest: Folder to make
+        :return: Manifest , also saved as dest/backup.json (see backup_incremental)
+        """
+        return self._backup(dest,None)
+
+
+    def backup_incremental(self,dest,since=None):
+        """
+        Like snapshot , but only copies what changed since an older backup (by generation and file state).
+        dest is a complete copy of the DB afterwards
+        :param dest: Folder of the backup (made , or brought up to date if it holds an older one)
+        :param since: Folder of the older backup (default : dest). Unchanged collections are hard linked from it ,
+                      log / paged ones only appended to since get just their new bytes (when since is dest)
+        :return: Manifest , with the "copied" , "appended" and "unchanged" collections
+        """
+        return self._backup(dest,since or dest)
+
+
+    def _backup(self,dest,since):
+        dest = os.path.abspath(dest)
+        previous = {}
+        if since is not None:
+            since = os.path.abspath(since)
+            try:
+                with open(os.path.join(since, BACKUP_MANIFEST)) as manifest_file:
+                    previous = json.load(manifest_file)["collections"]
+            except FileNotFoundError:
+                if since != dest:
+                    raise Exception(f"Error : `{since}` holds no backup")
+        in_place = since == dest and os.path.isdir(dest)
+        if not in_place:
+            if os.path.exists(dest) and os.listdir(dest):
+                raise Exception(f"Error : `{dest}` is not empty")
+            os.makedirs(dest, exist_ok=True)
+        manifest = {"created": time.time(), "collections": {}, "copied": [], "appended": [], "unchanged": []}
+        with contextlib.ExitStack() as files:
+            # Point in time : every collection (then config.json) is read locked while its state is taken ,
+            # again if collections were added / dropped before the locks were held
+            collections = sorted(self.collections)
+            while True:
+                with contextlib.ExitStack() as locks:
+                    for e in collections:
+                        locks.enter_context(self.collection_lock(e).read())
+                    locks.enter_context(self.config_lock().read())
+                    config = get_config(self.db_path).read()
+                    if sorted(config["collections"]) == collections:
+                        locks = locks.pop_all()
+                        break
+                collections = sorted(config["collections"])
+            with locks:
+                jobs = []
+                for e in collections:
+                    jobs.append(self._backup_capture(e,dest,since,in_place,previous.get(e),manifest,files))
+            for job in jobs:
+                job()
+            for e in os.listdir(dest) if in_place else ():
+                # Collections dropped since the older backup
+                if e not in config["collections"] and e not in (CONFIG_FILE, BACKUP_MANIFEST) and not self.is_aux_file(e, config["collections"]):
+                    os.remove(os.path.join(dest, e))
+        atomic_write(os.path.join(dest, CONFIG_FILE), json.dumps(config).encode())
+        atomic_write(os.path.join(dest, BACKUP_MANIFEST), json.dumps(manifest).encode())
+        return manifest
+
+
+    def _backup_capture(self,collection,dest,since,in_place,previous,manifest,files):
+        """
+        Takes the state of a collection (called with its lock held) and returns the copying to do once it is released
+        """
+        path = self.collection_path(collection)
+        target = os.path.join(dest, collection)
+        db_file = files.enter_context(open(path, "rb"))
+        stat = os.fstat(db_file.fileno())
+        head = db_file.read(len(LOG_MAGIC))
+        header = None
+        if head == PAGE_MAGIC:
+            end = self._page_directory(db_file)[2]
+            db_file.seek(0)
+            header = db_file.read(PAGE_HEADER_SIZE)
+        elif head == LOG_MAGIC:
+            # Without a partial record left by a crash
+            end = self._log_live(db_file,stat)[2]
+        else:
+            end = stat.st_size
+        fmt = {LOG_MAGIC: "log", PAGE_MAGIC: "paged", MMAP_MAGIC: "mmap"}.get(head, "blob")
+        entry = {"generation": self._read_generation(collection), "state": self._collection_state(collection),
+                 "format": fmt, "size": end}
+        manifest["collections"][collection] = entry
+        aux = {}
+        for aux_path in (self._index_path(collection), self._meta_path(collection)):
+            try:
+                with open(aux_path, "rb") as aux_file:
+                    aux[os.path.basename(aux_path)] = aux_file.read()
+            except FileNotFoundError:
+                pass
+        unchanged = previous is not None and previous["state"] == entry["state"] and previous["generation"] == entry["generation"]
+        appended = (in_place and not unchanged and previous is not None and fmt in ("log", "paged")
+                    and previous["format"] == fmt and previous["state"][2] == stat.st_ino and previous["size"] <= end)
+        linked = False
+        if unchanged:
+            manifest["unchanged"].append(collection)
+            # Only files that are always replaced whole are shared between backups , a log / paged file
+            # is appended to in place by the next backup_incremental of the older backup
+            if not in_place and fmt in ("blob", "mmap"):
+                linked = self._backup_link(os.path.join(since, collection),target)
+        elif fmt in ("blob", "mmap"):
+            # Never changed in place , the open file stays as it is even if it is replaced later
+            manifest["copied"].append(collection)
+            linked = self._backup_link(path,target)
+        else:
+            manifest["appended" if appended else "copied"].append(collection)
+
+        def job():
+            for name, data in aux.items():
+                atomic_write(os.path.join(dest, name), data)
+            if (unchanged and in_place) or linked:
+                return
+            if unchanged:
+                source = files.enter_context(open(os.path.join(since, collection), "rb"))
+                self._backup_copy(source,target,0,os.fstat(source.fileno()).st_size)
+            elif appended:
+                self._backup_copy(db_file,target,previous["size"],end,header)
+            else:
+                self._backup_copy(db_file,target,0,end,header)
+        return job
+
+
+    def _backup_link(self,source,target):
+        """
+        Hard links a file into a backup
+        :return: True , False if it has to be copied (eg : another file system)
+        """
+        tmp_path = f"{target}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            return False
+        os.replace(tmp_path, target)
+        return True
+
+
+    def _backup_copy(self,source,target,start,end,header=None):
+        """
+        Copies bytes start:end of an open file into a backup file. From 0 the file is made anew (through a temp file) ,
+        else the bytes are appended to the older copy. header (of a paged file) is written over the start last
+        """
+        shared = bool(start) and os.stat(target).st_nlink > 1
+        if start and not shared:
+            out = open(target, "r+b")
+            out.truncate(start)
+            out.seek(start)
+            tmp_path = None
+        else:
+            tmp_path = f"{target}.{os.getpid()}-{threading.get_ident()}.tmp"
+            out = open(tmp_path, "wb")
+        try:
+            with out:
+                if shared:
+                    # Hard linked with another backup : the older copy is copied , never changed in place
+                    with open(target, "rb") as older:
+                        left = start
+                        while left > 0:
+                            chunk = older.read(min(STREAM_CHUNK, left))
+                            if not chunk:
+                                break
+                            out.write(chunk)
+                            left -= len(chunk)
+                source.seek(start)
+                left = end - start
+                while left > 0:
+                    chunk = source.read(min(STREAM_CHUNK, left))
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    left -= len(chunk)
+                if header is not None:
+                    out.flush()
+                    out.seek(0)
+                    out.write(header)
+                out.flush()
+                os.fsync(out.fileno())
+            if tmp_path is not None:
+                os.replace(tmp_path, target)
+        except BaseException:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+
     def make_new_db(self):
         os.mkdir(self.db_path)
-        past = os.getcwd()
-        os.chdir(self.db_path)
         today = datetime.date.today()
         date = today.strftime("%d/%m/%Y")
-        config_file = open("config.json","x")
         config_data = {"DB_NAME":self.db_name,"CREATED":date,"collections":[],"ENC":False}
-        config_file.write(json.dumps(config_data))
-        config_file.close()
+        get_config(self.db_path).write(config_data)
         self.print_info("New Config File created")
-        os.chdir(past)
 
 
     def get_db_name(self):
         """
         :return: The Name of the DB
         """
-        return self.get_settings()["DB_NAME"]
+        return get_config(self.db_path).get()["DB_NAME"]
 
 
     def get_db_size(self):
@@ -241,19 +1754,7 @@ class OsomeDB:
         """
         :return: The data in the Config File
         """
-        past = os.getcwd()
-        try:
-            os.chdir(self.db_path)
-        except:
-            pass
-        config_fle = open("config.json","r")
-        data = config_fle.read()
-        config_fle.close()
-        try:
-            os.chdir(past)
-        except:
-            pass
-        return json.loads(data)
+        return get_config(self.db_path).read()
 
 
     def write_settings(self,settings):
@@ -262,18 +1763,8 @@ class OsomeDB:
         :param settings: New Settings
         :return: None
         """
-        past = os.getcwd()
-        try:
-            os.chdir(self.db_path)
-        except:
-            pass
-        config_fle = open("config.json", "w")
-        config_fle.write(json.dumps(settings))
-        config_fle.close()
-        try:
-            os.chdir(past)
-        except:
-            pass
+        get_config(self.db_path).write(settings)
+        self.db._refresh(settings)
 
 
     def renew_db(self):
@@ -281,86 +1772,67 @@ class OsomeDB:
         Renews the DB with the new config file
         :return: None
         """
-        if not os.getcwd() == self.db_path:
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            if not os.path.exists("config.json"):
+        with self.config_lock().write():
+            config_path = os.path.join(self.db_path, CONFIG_FILE)
+            new_config = not os.path.exists(config_path)
+            if new_config:
                 self.print_warning("Config file not found")
                 today = datetime.date.today()
                 date = today.strftime("%d/%m/%Y")
-                config_file = open("config.json", "x")
                 config_data = {"DB_NAME": self.db_name, "CREATED": date, "collections": [], "ENC": False}
-                config_file.write(json.dumps(config_data))
-                config_file.close()
+                get_config(self.db_path).write(config_data)
                 self.print_info("New Config File created")
-            config = self.get_settings()
-            for e in config["collections"]:
-                if not os.path.exists(e):
-                    file = open(e,"x")
-                    file.write(json.dumps([]))
-                    file.close()
-            for e in os.listdir():
-                if e not in config["collections"] and e != "config.json":
-                    os.remove(e)
             try:
-                os.chdir(past)
-            except:
-                pass
-        else:
-            if not os.path.exists("config.json"):
-                self.print_warning("Config file not found")
-                today = datetime.date.today()
-                date = today.strftime("%d/%m/%Y")
-                config_file = open("config.json", "x")
-                config_data = {"DB_NAME": self.db_name, "CREATED": date, "collections": [],"ENC": False}
-                config_file.write(json.dumps(config_data))
-                config_file.close()
-                self.print_info("New Config File created")
-            config = self.get_settings()
+                config = get_config(self.db_path).get()
+            except ValueError:
+                raise Exception("Error : config.json is corrupted , no file was removed")
             for e in config["collections"]:
-                if not os.path.exists(e):
-                    file = open(e, "x")
-                    file.write(json.dumps([]))
-                    file.close()
-            for e in os.listdir():
-                if e not in config["collections"] and e != "config.json":
-                    os.remove(e)
-
-
+                self._create_collection_file(e)
+            # Left over temp files are commits that never reached os.replace , they are dropped here
+            # (unless the process writing them still runs)
+            for e in os.listdir(self.db_path):
+                if e.endswith(LOCK_SUFFIX) or e == BACKUP_MANIFEST or temp_file_owner_alive(e):
+                    continue
+                if e not in config["collections"] and e != CONFIG_FILE and not self.is_aux_file(e, config["collections"]):
+                    if new_config and not e.startswith("."):
+                        # Without the old config there is no telling what this file was , keep it
+                        self.print_warning("`%s` is not in the new config file , kept", e)
+                        continue
+                    os.remove(os.path.join(self.db_path, e))
+        for e in config["collections"]:
+            self.recover_collection(e)
+
+
+    @traced
     def load_collection_raw(self,collection):
         """
-        Loads the raw collection data
+        Loads the raw collection data (the serialized docs , see decode_payload)
         :param collection: Collection name
-        :return: Raw Collection
+        :return: Raw Collection (bytes)
         """
+        metrics = self.db._metrics
         try:
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            db_file = open(collection,"rb")
-            raw_data = db_file.read()
-            db_file.close()
-            raw_data = self.de_compress(raw_data)
-            if self.enc != False:
-                try:
-                    enc_ = Fernet(self.password_to_key(self.enc))
-                    raw_data = enc_.decrypt(raw_data).decode()
-                except:
-                    pass
-            try:
-                os.chdir(past)
-            except:
-                pass
-            return raw_data
+            if metrics is not None:
+                start = time.perf_counter()
+            with self.collection_lock(collection).read():
+                db_file = open(self.collection_path(collection),"rb")
+                raw_data = db_file.read()
+                db_file.close()
+            if metrics is not None:
+                metrics.observe("read", collection, time.perf_counter() - start)
+                metrics.count("bytes_read", collection, len(raw_data))
+            if raw_data.startswith(LOG_MAGIC):
+                return encode_payload(self._log_docs(raw_data),self.get_codec(collection))
+            if raw_data.startswith(PAGE_MAGIC):
+                return encode_payload(self._page_docs_raw(raw_data),self.get_codec(collection))
+            if raw_data.startswith(MMAP_MAGIC):
+                return encode_payload(list(self.iter_collection(collection)),self.get_codec(collection))
+            return self.unpack_data(raw_data,collection)
         except:
             raise Exception("Error While Reading Collection")
 
 
+    @traced
     def load_collection(self,collection):
         """
         Returns the Collection data
@@ -368,40 +1840,49 @@ class OsomeDB:
         :return: Collection Data
         """
         try:
-            return json.loads(self.load_collection_raw(collection))
+            storage = self.collection_format(collection)
+            if storage == "log":
+                return self.load_collection_log(collection)
+            if storage in ("paged", "mmap"):
+                return list(self.iter_collection(collection))
+            raw_data = self.load_collection_raw(collection)
+            metrics = self.db._metrics
+            if metrics is None:
+                return decode_payload(raw_data)
+            start = time.perf_counter()
+            data = decode_payload(raw_data)
+            metrics.observe("parse", collection, time.perf_counter() - start)
+            return data
         except:
             raise Exception("Error While Loading Collection")
 
 
+    @traced
     def write_collection_raw(self,collection,data):
         """
         Writes Raw collection data
         :param collection: Collection Name
-        :param data: New Collection Data
+        :param data: New Collection Data , serialized (see encode_payload)
         :return: None
         """
+        with self.collection_lock(collection).write():
+            self._write_blob(collection,data)
+            # The docs are not decoded , count_docs works their number out when asked
+            self._save_meta(collection,None)
+
+
+    def _write_blob(self,collection,data):
         try:
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            data = data.encode()
-            if self.enc != False:
-                enc_ = Fernet(self.password_to_key(self.enc))
-                data = enc_.encrypt(data)
-            data = self.compress(data)
-            db_file = open(collection, "wb")
-            db_file.write(data)
-            db_file.close()
-            try:
-                os.chdir(past)
-            except:
-                pass
+            if isinstance(data, str):
+                data = data.encode()
+            data = self.pack_data(data,self.get_compression(collection),collection)
+            with self.collection_lock(collection).write():
+                self.commit_file(self.collection_path(collection),data)
         except:
             raise Exception("Error While Writing Collection")
 
 
+    @traced
     def write_collection(self,collection,data):
         """
         Writes collection data
@@ -409,503 +1890,2939 @@ class OsomeDB:
         :param data: New Collection
         :return: None
         """
-        try:
-            self.write_collection_raw(collection,json.dumps(data))
-        except:
-            raise Exception("Error While Saving Collection")
+        indexes = self._build_indexes(collection,data)
+        with self.collection_lock(collection).write():
+            try:
+                storage = self.get_storage(collection)
+                if storage == "log":
+                    self.write_collection_log(collection,data)
+                elif storage == "paged":
+                    self.write_collection_paged(collection,data)
+                elif storage == "mmap":
+                    self.write_collection_mmap(collection,data)
+                elif self.db._metrics is not None:
+                    start = time.perf_counter()
+                    payload = encode_payload(data,self.get_codec(collection))
+                    self.db._metrics.observe("serialize", collection, time.perf_counter() - start)
+                    self._write_blob(collection,payload)
+                else:
+                    self._write_blob(collection,encode_payload(data,self.get_codec(collection)))
+            except:
+                raise Exception("Error While Saving Collection")
+            if indexes:
+                self._save_indexes(collection,indexes)
+            self._save_meta(collection,len(data))
 
 
-    def delete_collection(self,collection):
+    def pack_data(self,data,compression=None,collection=None):
         """
-        Deletes a Collection
-        :param collection: Collection Name
-        :return: None
+        Compresses and encrypts (if ENC is on) bytes , behind a header telling how
+        :param data: Bytes
+        :param compression: See parse_compression (default : COMPRESSION in config.json , else "zlib")
+        :param collection: Collection the data belongs to (only used to tag metrics)
+        :return: Bytes to store
         """
-        try:
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            os.remove(collection)
+        if compression is None:
+            compression = get_config(self.db_path).get().get("COMPRESSION", "zlib")
+        metrics = self.db._metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        flags, data = compress_payload(data, compression)
+        if metrics is not None:
+            metrics.observe("compress", collection, time.perf_counter() - start)
+        if self.enc != False:
+            fernet = self.get_fernet(self.enc)
+            if metrics is not None:
+                start = time.perf_counter()
+            data = base64.urlsafe_b64decode(fernet.encrypt(data))
+            if metrics is not None:
+                metrics.observe("encrypt", collection, time.perf_counter() - start)
+            flags |= PACK_ENCRYPTED
+        return PACK_MAGIC + bytes([flags]) + data
+
+
+    def unpack_data(self,data,collection=None):
+        """
+        Reverses pack_data (and reads the payloads written before it had a header)
+        :param data: Stored bytes
+        :param collection: Collection the data belongs to (only used to tag metrics)
+        :return: Bytes
+        """
+        if data[:1] == PACK_MAGIC:
+            metrics = self.db._metrics
+            flags = data[1]
+            data = data[2:]
+            if flags & PACK_ENCRYPTED:
+                if self.enc == False:
+                    raise Exception("Error : The data is encrypted and ENC is off")
+                fernet = self.get_fernet(self.enc)
+                if metrics is not None:
+                    start = time.perf_counter()
+                data = fernet.decrypt(base64.urlsafe_b64encode(data))
+                if metrics is not None:
+                    metrics.observe("decrypt", collection, time.perf_counter() - start)
+            if metrics is None:
+                return decompress_payload(flags & ~PACK_ENCRYPTED, data)
+            start = time.perf_counter()
+            data = decompress_payload(flags & ~PACK_ENCRYPTED, data)
+            metrics.observe("decompress", collection, time.perf_counter() - start)
+            return data
+        data = self.de_compress(data)
+        if self.enc != False:
             try:
-                os.chdir(past)
+                data = self.get_fernet(self.enc).decrypt(data)
             except:
                 pass
-        except:
-            raise Exception("Error : Error While Deleting The Collection")
+        return data
 
 
-    def get_collection_size(self,collection):
+    def get_collection_options(self,collection):
         """
-        Gets the size of the Collection
         :param collection: Collection Name
-        :return: Size
+        :return: The per collection options in config.json
         """
-        try:
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            size = os.path.getsize(collection)
+        return get_config(self.db_path).get().get("collection_options", {}).get(collection, {})
+
+
+    def get_storage(self,collection):
+        """
+        The storage a collection is written with
+        :param collection: Collection Name
+        :return: "blob" / "log" / "paged" / "mmap"
+        """
+        return self.get_collection_options(collection).get("storage", "blob")
+
+
+    def collection_format(self,collection):
+        """
+        The storage the collection file is currently in (can differ from get_storage before a migration)
+        :param collection: Collection Name
+        :return: "blob" / "log" / "paged" / "mmap"
+        """
+        with self.collection_lock(collection).read():
+            with open(self.collection_path(collection), "rb") as db_file:
+                head = db_file.read(len(LOG_MAGIC))
+        if head == LOG_MAGIC:
+            return "log"
+        if head == PAGE_MAGIC:
+            return "paged"
+        if head == MMAP_MAGIC:
+            return "mmap"
+        return "blob"
+
+
+    def migrate_collection(self,collection,storage):
+        """
+        Rewrites a collection in another storage
+        :param collection: Collection Name
+        :param storage: "blob" / "log" / "paged" / "mmap"
+        :return: None
+        """
+        if storage not in STORAGE_FORMATS:
+            raise Exception(f"Error : Unknown storage `{storage}`")
+        if storage == "mmap" and self.enc != False:
+            raise Exception("Error : mmap collections can not be encrypted")
+        with self.collection_lock(collection).write():
+            data = self.load_collection(collection)
+            with self.config_lock().write():
+                settings = self.get_settings()
+                settings.setdefault("collection_options", {}).setdefault(collection, {})["storage"] = storage
+                self.write_settings(settings)
+            self.write_collection(collection,data)
+
+
+    def get_compression(self,collection):
+        """
+        The compression a collection is written with
+        :param collection: Collection Name
+        :return: See parse_compression
+        """
+        return self.get_collection_options(collection).get("compression", get_config(self.db_path).get().get("COMPRESSION", "zlib"))
+
+
+    def get_codec(self,collection):
+        """
+        The codec a collection is written with
+        :param collection: Collection Name
+        :return: "json" / "msgpack" / "marshal" / "pickle"
+        """
+        return self.get_collection_options(collection).get("codec", get_config(self.db_path).get().get("CODEC", "json"))
+
+
+    def migrate_codec(self,collection,codec):
+        """
+        Rewrites a collection with another codec. Docs written with the old one stay readable ,
+        without a migration a collection switches codec doc by doc as it is written
+        :param collection: Collection Name
+        :param codec: "json" / "msgpack" / "marshal" / "pickle"
+        :return: None
+        """
+        if codec not in CODECS:
+            raise Exception(f"Error : Unknown codec `{codec}`")
+        if codec == "msgpack":
+            _msgpack()
+        with self.collection_lock(collection).write():
+            data = self.load_collection(collection)
+            with self.config_lock().write():
+                settings = self.get_settings()
+                settings.setdefault("collection_options", {}).setdefault(collection, {})["codec"] = codec
+                self.write_settings(settings)
+            self.write_collection(collection,data)
+
+
+    def _log_scan(self,raw_data):
+        """
+        Replays the record headers of a log , no payload is decoded
+        :param raw_data: The log file's bytes
+        :return: [(start , end) of the live payloads] , number of records , end of the last complete record
+        """
+        return self._log_scan_file(io.BytesIO(raw_data),len(raw_data))
+
+
+    def _log_scan_file(self,db_file,total,live=None,records=0,pos=None):
+        """
+        Replays the records of an open log , checking their CRC (no payload is decoded)
+        :param db_file: The log file (binary)
+        :param total: Bytes of the file to replay
+        :param live: Live payloads replayed so far , extended in place (default : start from the first record)
+        :param records: Records replayed so far
+        :param pos: Where the next record starts
+        :return: [(start , end) of the live payloads] , number of records , end of the last complete record
+        """
+        if live is None:
+            live = []
+            pos = len(LOG_MAGIC)
+        db_file.seek(pos)
+        while pos + LOG_HEADER.size <= total:
+            op, index, length, crc = LOG_HEADER.unpack(db_file.read(LOG_HEADER.size))
+            start = pos + LOG_HEADER.size
+            # A short or torn (eg : zeroed) record is the end of the log
+            if start + length > total or zlib.crc32(db_file.read(length)) != crc:
+                break
+            if op == LOG_INSERT:
+                live.append((start, start + length))
+            elif op == LOG_REPLACE:
+                live[index] = (start, start + length)
+            elif op == LOG_DELETE:
+                del live[index]
+            else:
+                break
+            records += 1
+            pos = start + length
+        return live, records, pos
+
+
+    def _log_live(self,db_file,stat=None):
+        """
+        The replayed live payloads of an open log , kept in memory per file state (inode , size , mtime)
+        and extended by the appends of this process , so only the first read replays the whole log.
+        The lists are never changed once cached : do not modify them
+        :param db_file: The log file (binary) , opened through its path
+        :param stat: os.stat_result of the file taken under the collection lock (default : now)
+        :return: [(start , end) of the live payloads] , number of records , end of the last complete record
+        """
+        if stat is None:
+            stat = os.fstat(db_file.fileno())
+        state = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = self.db._logs.get(db_file.name)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        replayed = self._log_scan_file(db_file,stat.st_size)
+        self.db._logs[db_file.name] = (state, replayed)
+        return replayed
+
+
+    def _log_docs(self,raw_data):
+        live, records, end = self._log_scan(raw_data)
+        return [decode_payload(self.unpack_data(raw_data[a:b])) for a, b in live]
+
+
+    def _log_record(self,op,index,doc=None,codec="json",compression=None,collection=None):
+        payload = b"" if doc is None else self.pack_data(self._serialize(doc,codec,collection),compression,collection)
+        return LOG_HEADER.pack(op, index, len(payload), zlib.crc32(payload)) + payload
+
+
+    def load_collection_log(self,collection):
+        """
+        Rebuilds the live docs of a log collection by replaying it
+        :param collection: Collection Name
+        :return: Collection Data
+        """
+        with self.collection_lock(collection).read():
+            with open(self.collection_path(collection), "rb") as db_file:
+                stat = os.fstat(db_file.fileno())
+                raw_data = self._read(db_file,collection)
+                live, records, end = self._log_live(db_file,stat)
+        payloads = [self.unpack_data(raw_data[a:b],collection) for a, b in live]
+        with self._stage("parse",collection):
+            data = [decode_payload(e) for e in payloads]
+        dead = records - len(live)
+        if dead >= LOG_COMPACT_MIN_DEAD and dead > len(live) and self.get_storage(collection) == "log":
             try:
-                os.chdir(past)
-            except:
+                self.compact_collection(collection)
+            except RuntimeError:
+                # The caller holds a read lock , compact on a later load
                 pass
-        except:
-            raise Exception("Error : Error While Getting The Collection Size")
-        return size
+        return data
 
 
-    def password_to_key(self,password):
-        salt = b'.-Kh)ura/)\xcef\xc8\x88u\xc2'
-        password = password.encode()
-        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100000, backend=default_backend())
-        key = base64.urlsafe_b64encode(kdf.derive(password))
-        return key
+    def write_collection_log(self,collection,data):
+        """
+        Writes a fresh (compacted) log holding the docs
+        :param collection: Collection Name
+        :param data: Docs
+        :return: None
+        """
+        codec = self.get_codec(collection)
+        compression = self.get_compression(collection)
+        records = [self._log_record(LOG_INSERT, index, doc, codec, compression, collection) for index, doc in enumerate(data)]
+        with self.collection_lock(collection).write():
+            self.commit_file(self.collection_path(collection),LOG_MAGIC + b"".join(records))
 
 
-    def compress(self,data):
-        data_ = zlib.compress(data)
-        if len(data_) < len(data):
-            final = data_
+    def _log_append(self,collection,records):
+        """
+        Appends records to a log collection
+        :param collection: Collection Name
+        :param records: Encoded records
+        :return: False when the file is not a log yet (nothing written)
+        """
+        if self.get_storage(collection) != "log" or self.collection_format(collection) != "log":
+            return False
+        path = self.collection_path(collection)
+        policy = self.fsync_policy()
+        data = b"".join(records)
+        with self.collection_lock(collection).write():
+            with open(path, "a+b") as db_file:
+                before = os.fstat(db_file.fileno())
+                with self._stage("write",collection):
+                    db_file.write(data)
+                    db_file.flush()
+                    if policy == "always":
+                        os.fsync(db_file.fileno())
+                cached = self.db._logs.pop(path, None)
+                if cached is not None and cached[0] == (before.st_ino, before.st_size, before.st_mtime_ns) and cached[1][2] == before.st_size:
+                    # Only the new records are replayed , on a copy : readers may hold the old table
+                    live, count, end = cached[1]
+                    replayed = self._log_scan_file(db_file,before.st_size + len(data),list(live),count,end)
+                    after = os.fstat(db_file.fileno())
+                    self.db._logs[path] = ((after.st_ino, after.st_size, after.st_mtime_ns), replayed)
+        if self.db._metrics is not None:
+            self.db._metrics.count("bytes_written", collection, len(data))
+        if policy == "batch":
+            self._sync_later(path)
+        return True
+
+
+    def _log_count(self,collection):
+        with self.collection_lock(collection).read():
+            with open(self.collection_path(collection), "rb") as db_file:
+                return len(self._log_live(db_file)[0])
+
+
+    @traced
+    def append_docs(self,collection,docs):
+        """
+        Appends docs to a collection (log collections only append the new records)
+        :param collection: Collection Name
+        :param docs: Docs
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            if self.get_storage(collection) == "log" and self.collection_format(collection) == "log":
+                indexes = self._load_indexes(collection)
+                meta = self._load_meta(collection)
+                for doc in docs:
+                    for key, index in indexes.items():
+                        self._index_insert(index, key, doc)
+                codec = self.get_codec(collection)
+                compression = self.get_compression(collection)
+                self._log_append(collection,[self._log_record(LOG_INSERT, 0, e, codec, compression, collection) for e in docs])
+                if indexes:
+                    self._save_indexes(collection,indexes)
+                self._save_meta(collection,meta["count"] + len(docs) if meta is not None else self._log_count(collection))
+            elif self.get_storage(collection) in ("paged", "mmap") and self.collection_format(collection) == self.get_storage(collection):
+                indexes = self._load_indexes(collection)
+                for doc in docs:
+                    for key, index in indexes.items():
+                        self._index_insert(index, key, doc)
+                if self.get_storage(collection) == "paged":
+                    count = self._page_append(collection,docs)
+                else:
+                    count = self._mmap_append(collection,docs)
+                if indexes:
+                    self._save_indexes(collection,indexes)
+                self._save_meta(collection,count)
+            else:
+                data = self.load_collection(collection)
+                data.extend(docs)
+                self.write_collection(collection,data)
+
+
+    def replace_doc(self,collection,index,doc):
+        """
+        Replaces the doc at index (log collections store it as a new version)
+        :param collection: Collection Name
+        :param index: Index
+        :param doc: New Doc
+        :return: None
+        """
+        self.replace_docs(collection,{index: doc})
+
+
+    @traced
+    def replace_docs(self,collection,changes):
+        """
+        Replaces several docs with one commit
+        :param collection: Collection Name
+        :param changes: {index : new doc}
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            if self.get_storage(collection) == "log" and self.collection_format(collection) == "log":
+                changes = self._log_positions(collection,changes)
+                indexes = self._load_indexes(collection)
+                meta = self._load_meta(collection)
+                for index, doc in changes.items():
+                    for key, key_index in indexes.items():
+                        self._index_replace(key_index, key, index, doc)
+                codec = self.get_codec(collection)
+                compression = self.get_compression(collection)
+                self._log_append(collection,[self._log_record(LOG_REPLACE, index, doc, codec, compression, collection) for index, doc in changes.items()])
+                if indexes:
+                    self._save_indexes(collection,indexes)
+                self._save_meta(collection,meta["count"] if meta is not None else self._log_count(collection))
+            elif self.get_storage(collection) in ("paged", "mmap") and self.collection_format(collection) == self.get_storage(collection):
+                changes = self._log_positions(collection,changes)
+                indexes = self._load_indexes(collection)
+                for index, doc in changes.items():
+                    for key, key_index in indexes.items():
+                        self._index_replace(key_index, key, index, doc)
+                if self.get_storage(collection) == "paged":
+                    count = self._page_replace(collection,changes)
+                else:
+                    count = self._mmap_replace(collection,changes)
+                if indexes:
+                    self._save_indexes(collection,indexes)
+                self._save_meta(collection,count)
+            else:
+                data = self.load_collection(collection)
+                for index, doc in changes.items():
+                    data[index] = doc
+                self.write_collection(collection,data)
+
+
+    def delete_doc(self,collection,index):
+        """
+        Deletes the doc at index (log collections append a tombstone)
+        :param collection: Collection Name
+        :param index: Index
+        :return: None
+        """
+        self.delete_docs(collection,[index])
+
+
+    @traced
+    def delete_docs(self,collection,positions):
+        """
+        Deletes several docs with one commit
+        :param collection: Collection Name
+        :param positions: Indexes of the docs (before any of them is deleted)
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            if self.get_storage(collection) == "log" and self.collection_format(collection) == "log":
+                # Highest first , so every tombstone's position is still the doc's position
+                positions = sorted(self._log_positions(collection,dict.fromkeys(positions)), reverse=True)
+                indexes = self._load_indexes(collection)
+                meta = self._load_meta(collection)
+                for key_index in indexes.values():
+                    self._index_delete(key_index, positions)
+                self._log_append(collection,[self._log_record(LOG_DELETE, index) for index in positions])
+                if indexes:
+                    self._save_indexes(collection,indexes)
+                self._save_meta(collection,meta["count"] - len(positions) if meta is not None else self._log_count(collection))
+            elif self.get_storage(collection) in ("paged", "mmap") and self.collection_format(collection) == self.get_storage(collection):
+                positions = sorted(self._log_positions(collection,dict.fromkeys(positions)), reverse=True)
+                indexes = self._load_indexes(collection)
+                for key_index in indexes.values():
+                    self._index_delete(key_index, positions)
+                if self.get_storage(collection) == "paged":
+                    count = self._page_delete(collection,positions)
+                else:
+                    count = self._mmap_delete(collection,positions)
+                if indexes:
+                    self._save_indexes(collection,indexes)
+                self._save_meta(collection,count)
+            else:
+                data = self.load_collection(collection)
+                for index in sorted({range(len(data))[e] for e in positions}, reverse=True):
+                    del data[index]
+                self.write_collection(collection,data)
+
+
+    def _log_positions(self,collection,changes):
+        """
+        Checks the positions of a log / paged / mmap collection and makes negative ones absolute
+        :param collection: Collection Name
+        :param changes: {index : value}
+        :return: {absolute index : value}
+        """
+        storage = self.collection_format(collection)
+        if storage == "paged":
+            count = self._page_count(collection)
+        elif storage == "mmap":
+            count = len(self._mmap_view(collection)[1]) - 1
         else:
-            final = data
-        return final
+            count = self._log_count(collection)
+        checked = {}
+        for index, value in changes.items():
+            if index < 0:
+                index += count
+            if not 0 <= index < count:
+                raise IndexError("list assignment index out of range")
+            checked[index] = value
+        return checked
+
+
+    def compact_collection(self,collection):
+        """
+        Drops the dead records (tombstones , old versions) of a log collection ,
+        or the replaced pages and directories of a paged one
+        :param collection: Collection Name
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            storage = self.collection_format(collection)
+            if storage == "paged":
+                self._page_compact(collection)
+                return
+            if storage != "log":
+                return
+            path = os.path.join(self.db_path, collection)
+            db_file = open(path, "rb")
+            raw_data = db_file.read()
+            db_file.close()
+            live, records, end = self._log_scan(raw_data)
+            indexes = self._load_indexes(collection)
+            compacted = [LOG_MAGIC]
+            for index, (a, b) in enumerate(live):
+                compacted.append(LOG_HEADER.pack(LOG_INSERT, index, b - a, zlib.crc32(raw_data[a:b])))
+                compacted.append(raw_data[a:b])
+            self.commit_file(path,b"".join(compacted))
+            if indexes:
+                self._save_indexes(collection,indexes)
+            self._save_meta(collection,len(live))
+
+
+    def _page_size(self,collection):
+        """
+        :param collection: Collection Name
+        :return: Docs per page of a paged collection
+        """
+        return self.get_collection_options(collection).get("page_docs", PAGE_DOCS)
 
 
-    def de_compress(self,data):
+    def _page_directory(self,db_file,verify=False):
+        """
+        Reads the active directory of an open paged file. A torn directory (CRC mismatch) is an
+        incomplete commit , the other slot's (the previous commit) is used instead
+        :param db_file: The paged file (binary)
+        :param verify: Also check the CRC of every page , a torn page drops its directory too
+        :return: [(offset , length , docs , crc) per page] , the slot used , end of the directory
+        """
+        db_file.seek(len(PAGE_MAGIC))
+        head = db_file.read(1 + 2 * PAGE_SLOT.size)
+        for slot in (head[0], 1 - head[0]):
+            offset, length, crc = PAGE_SLOT.unpack_from(head, 1 + slot * PAGE_SLOT.size)
+            if not offset:
+                # Never filled
+                continue
+            db_file.seek(offset)
+            raw = db_file.read(length)
+            if len(raw) != length or zlib.crc32(raw) != crc:
+                continue
+            entries = [PAGE_ENTRY.unpack_from(raw, pos) for pos in range(0, length, PAGE_ENTRY.size)]
+            if verify and not all(self._page_valid(db_file, entry) for entry in entries):
+                continue
+            return entries, slot, offset + length
+        raise Exception("Error : No valid page directory")
+
+
+    def _page_valid(self,db_file,entry):
+        db_file.seek(entry[0])
+        raw = db_file.read(entry[1])
+        return len(raw) == entry[1] and zlib.crc32(raw) == entry[3]
+
+
+    def _page_raw(self,db_file,entry,collection=None):
+        """
+        The packed bytes of a page , checked against its CRC
+        :param collection: Collection name , the read is timed (None : the bytes are in memory already)
+        """
+        db_file.seek(entry[0])
+        raw = db_file.read(entry[1]) if collection is None else self._read(db_file,collection,entry[1])
+        if zlib.crc32(raw) != entry[3]:
+            raise Exception(f"Error : Page at {entry[0]} failed its CRC check")
+        return raw
+
+
+    def _page_read(self,db_file,entry):
+        collection = os.path.basename(getattr(db_file, "name", "")) if self.db._metrics is not None else None
+        return self._parse(self.unpack_data(self._page_raw(db_file, entry, collection),collection),collection)
+
+
+    def _page_docs_raw(self,raw_data):
+        db_file = io.BytesIO(raw_data)
+        docs = []
+        for entry in self._page_directory(db_file)[0]:
+            docs.extend(decode_payload(self.unpack_data(self._page_raw(db_file, entry))))
+        return docs
+
+
+    def _page_starts(self,entries):
+        """
+        :param entries: Directory
+        :return: Position of the first doc of every page
+        """
+        starts = []
+        total = 0
+        for entry in entries:
+            starts.append(total)
+            total += entry[2]
+        return starts
+
+
+    def _page_count(self,collection):
+        with self.collection_lock(collection).read():
+            with open(self.collection_path(collection), "rb") as db_file:
+                return sum(e[2] for e in self._page_directory(db_file)[0])
+
+
+    def write_collection_paged(self,collection,data):
+        """
+        Writes a fresh paged file holding the docs
+        :param collection: Collection Name
+        :param data: Docs
+        :return: None
+        """
+        page_docs = self._page_size(collection)
+        codec = self.get_codec(collection)
+        compression = self.get_compression(collection)
+        pages = []
+        for start in range(0, len(data), page_docs):
+            page = data[start:start + page_docs]
+            pages.append((self.pack_data(self._serialize(page,codec,collection),compression,collection), len(page)))
+        with self.collection_lock(collection).write():
+            self.commit_file(self.collection_path(collection),self._page_file(pages))
+
+
+    def _page_file(self,pages):
+        """
+        A fresh paged file
+        :param pages: [(packed page , docs)]
+        :return: Bytes
+        """
+        entries = []
+        pos = PAGE_HEADER_SIZE
+        for page, count in pages:
+            entries.append((pos, len(page), count, zlib.crc32(page)))
+            pos += len(page)
+        directory = b"".join(PAGE_ENTRY.pack(*e) for e in entries)
+        header = PAGE_MAGIC + b"\x00" + PAGE_SLOT.pack(pos, len(directory), zlib.crc32(directory)) + PAGE_SLOT.pack(0, 0, 0)
+        return header + b"".join(page for page, count in pages) + directory
+
+
+    def _page_update(self,collection,edit):
+        """
+        Writes the pages an edit changed , the other pages are not read nor written
+        :param collection: Collection Name
+        :param edit: Function(directory , read_page) returning the new pages , each one
+            a directory entry kept as it is or a list of docs to write (empty pages are dropped)
+        :return: The new directory
+        """
+        path = self.collection_path(collection)
+        policy = self.fsync_policy()
+        codec = self.get_codec(collection)
+        compression = self.get_compression(collection)
+        with self.collection_lock(collection).write():
+            with open(path, "r+b") as db_file:
+                entries, active, end = self._page_directory(db_file)
+                pages = edit(entries, lambda entry: self._page_read(db_file, entry))
+                db_file.seek(0, os.SEEK_END)
+                pos = db_file.tell()
+                written = []
+                directory = []
+                for page in pages:
+                    if isinstance(page, tuple):
+                        directory.append(page)
+                    elif page:
+                        packed = self.pack_data(self._serialize(page,codec,collection),compression,collection)
+                        directory.append((pos, len(packed), len(page), zlib.crc32(packed)))
+                        written.append(packed)
+                        pos += len(packed)
+                raw_directory = b"".join(PAGE_ENTRY.pack(*e) for e in directory)
+                data = b"".join(written) + raw_directory
+                with self._stage("write",collection):
+                    db_file.write(data)
+                    # The new directory goes in the inactive slot , the flip of the active byte commits it
+                    slot = 1 - active
+                    db_file.seek(len(PAGE_MAGIC) + 1 + slot * PAGE_SLOT.size)
+                    db_file.write(PAGE_SLOT.pack(pos, len(raw_directory), zlib.crc32(raw_directory)))
+                    if policy != "never":
+                        # The pages and directory reach the disk before the flip , "batch" included
+                        db_file.flush()
+                        os.fsync(db_file.fileno())
+                    db_file.seek(len(PAGE_MAGIC))
+                    db_file.write(bytes([slot]))
+                    if policy == "always":
+                        db_file.flush()
+                        os.fsync(db_file.fileno())
+                if self.db._metrics is not None:
+                    self.db._metrics.count("bytes_written", collection, len(data) + PAGE_SLOT.size + 1)
+            live = sum(e[1] for e in directory) + len(raw_directory)
+            dead = pos + len(raw_directory) - PAGE_HEADER_SIZE - live
+            if dead >= PAGE_COMPACT_MIN_DEAD and dead > live:
+                self._page_compact(collection)
+        if policy == "batch":
+            self._sync_later(path)
+        return directory
+
+
+    def _page_append(self,collection,docs):
+        page_docs = self._page_size(collection)
+
+        def edit(entries, read_page):
+            pages = list(entries)
+            new_docs = list(docs)
+            # The last page is filled up first
+            if pages and pages[-1][2] < page_docs:
+                new_docs = read_page(pages.pop()) + new_docs
+            for start in range(0, len(new_docs), page_docs):
+                pages.append(new_docs[start:start + page_docs])
+            return pages
+        return sum(e[2] for e in self._page_update(collection,edit))
+
+
+    def _page_replace(self,collection,changes):
+        def edit(entries, read_page):
+            pages = list(entries)
+            starts = self._page_starts(entries)
+            for index, doc in changes.items():
+                page = bisect.bisect_right(starts, index) - 1
+                if isinstance(pages[page], tuple):
+                    pages[page] = read_page(pages[page])
+                pages[page][index - starts[page]] = doc
+            return pages
+        return sum(e[2] for e in self._page_update(collection,edit))
+
+
+    def _page_delete(self,collection,positions):
+        def edit(entries, read_page):
+            pages = list(entries)
+            starts = self._page_starts(entries)
+            # Highest first , so the positions left in a page do not move
+            for index in sorted(positions, reverse=True):
+                page = bisect.bisect_right(starts, index) - 1
+                if isinstance(pages[page], tuple):
+                    pages[page] = read_page(pages[page])
+                del pages[page][index - starts[page]]
+            return pages
+        return sum(e[2] for e in self._page_update(collection,edit))
+
+
+    def _page_compact(self,collection):
+        path = self.collection_path(collection)
+        with self.collection_lock(collection).write():
+            with open(path, "rb") as db_file:
+                pages = []
+                for entry in self._page_directory(db_file)[0]:
+                    pages.append((self._page_raw(db_file, entry, collection), entry[2]))
+            indexes = self._load_indexes(collection)
+            self.commit_file(path,self._page_file(pages))
+            if indexes:
+                self._save_indexes(collection,indexes)
+            self._save_meta(collection,sum(count for page, count in pages))
+
+
+    def _mmap_table(self,view):
+        """
+        :param view: memoryview of a mmap file
+        :return: Offsets of the docs (count + 1 , the last one is where the last doc ends)
+        """
+        table, count = MMAP_TRAILER.unpack_from(view, len(view) - MMAP_TRAILER.size)
+        offsets = view[table:table + 8 * (count + 1)]
+        if sys.byteorder == "little":
+            return offsets.cast("Q")
+        swapped = array.array("Q", offsets.tobytes())
+        swapped.byteswap()
+        return swapped
+
+
+    def _mmap_view(self,collection):
+        """
+        The mapped file of a mmap collection , mapped once per process until the file is replaced.
+        Processes mapping the same file share its pages in the OS cache
+        :param collection: Collection Name
+        :return: memoryview of the file , offsets of the docs
+        """
+        path = self.collection_path(collection)
+        with self.collection_lock(collection).read():
+            with open(path, "rb") as db_file:
+                stat = os.fstat(db_file.fileno())
+                state = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                cached = self.db._mmaps.get(path)
+                metrics = self.db._metrics
+                if cached is not None and cached[0] == state:
+                    if metrics is not None:
+                        metrics.count("mmap_cache_hits", collection)
+                    return cached[1], cached[2]
+                if metrics is not None:
+                    metrics.count("mmap_cache_misses", collection)
+                with self._stage("read",collection):
+                    view = memoryview(mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ))
+                    offsets = self._mmap_table(view)
+        self.db._mmaps[path] = (state, view, offsets)
+        return view, offsets
+
+
+    def _mmap_file(self,payloads):
+        """
+        A fresh mmap file
+        :param payloads: Serialized docs (bytes / memoryviews)
+        :return: Bytes
+        """
+        offsets = array.array("Q", [len(MMAP_HEADER)])
+        for payload in payloads:
+            offsets.append(offsets[-1] + len(payload))
+        padding = b"\x00" * (-offsets[-1] % 8)
+        table = offsets[-1] + len(padding)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        return b"".join([MMAP_HEADER, *payloads, padding, offsets.tobytes(), MMAP_TRAILER.pack(table, len(payloads))])
+
+
+    def write_collection_mmap(self,collection,data):
+        """
+        Writes a fresh mmap file holding the docs
+        :param collection: Collection Name
+        :param data: Docs
+        :return: None
+        """
+        if self.enc != False:
+            raise Exception("Error : mmap collections can not be encrypted")
+        codec = self.get_codec(collection)
+        payloads = [self._serialize(doc,codec,collection) for doc in data]
+        with self.collection_lock(collection).write():
+            self.commit_file(self.collection_path(collection),self._mmap_file(payloads))
+
+
+    def _mmap_update(self,collection,edit):
+        """
+        Writes a new mmap file , the docs an edit did not touch are copied as they are (not decoded)
+        :param collection: Collection Name
+        :param edit: Function(payloads) changing the list of serialized docs in place
+        :return: Number of docs
+        """
+        with self.collection_lock(collection).write():
+            view, offsets = self._mmap_view(collection)
+            payloads = [view[offsets[e]:offsets[e + 1]] for e in range(len(offsets) - 1)]
+            edit(payloads)
+            self.commit_file(self.collection_path(collection),self._mmap_file(payloads))
+        return len(payloads)
+
+
+    def _mmap_append(self,collection,docs):
+        codec = self.get_codec(collection)
+        return self._mmap_update(collection,lambda payloads: payloads.extend(self._serialize(e,codec,collection) for e in docs))
+
+
+    def _mmap_replace(self,collection,changes):
+        codec = self.get_codec(collection)
+
+        def edit(payloads):
+            for index, doc in changes.items():
+                payloads[index] = self._serialize(doc,codec,collection)
+        return self._mmap_update(collection,edit)
+
+
+    def _mmap_delete(self,collection,positions):
+        def edit(payloads):
+            for index in sorted(positions, reverse=True):
+                del payloads[index]
+        return self._mmap_update(collection,edit)
+
+
+    def _meta_path(self,collection):
+        return os.path.join(self.db_path, f".{collection}{META_SUFFIX}")
+
+
+    def _load_meta(self,collection):
+        """
+        The metadata kept next to a collection (eg : its doc count)
+        :param collection: Collection Name
+        :return: Metadata , None if missing or older than the collection file
+        """
         try:
-            data_ = zlib.decompress(data)
-            return data_
-        except:
-            return data
+            with open(self._meta_path(collection), "rb") as meta_file:
+                meta = json.loads(meta_file.read())
+        except (OSError, ValueError):
+            return None
+        if meta.get("state") != self._collection_state(collection):
+            return None
+        return meta
+
+
+    def _save_meta(self,collection,count,bump=True):
+        """
+        Saves the metadata of a collection , called with its lock held
+        :param collection: Collection Name
+        :param count: Doc count (None : unknown , only the generation is kept)
+        :param bump: The collection was written , its generation goes up by one
+        :return: None
+        """
+        generation = self._read_generation(collection) + bump
+        state = self._collection_state(collection) if count is not None else None
+        meta = {"state": state, "count": count, "generation": generation}
+        atomic_write(self._meta_path(collection), json.dumps(meta).encode(), fsync=False)
 
 
-    def print_info(self, data):
-        print(f"{sty.fg(28, 178, 232)}INFO : {data}{sty.fg.rs}")
+    def _read_generation(self,collection):
+        try:
+            with open(self._meta_path(collection), "rb") as meta_file:
+                return json.loads(meta_file.read()).get("generation", 0)
+        except (OSError, ValueError, AttributeError):
+            return 0
 
 
-    def print_warning(self, data):
-        print(f"{sty.fg(242, 74, 68)}WARNING : {data}{sty.fg.rs}")
+    def generation(self,collection):
+        """
+        A counter going up with every write to a collection , from any process of the DB.
+        Compare it with an older value to know if a collection changed
+        :param collection: Collection Name
+        :return: Generation
+        """
+        with self.collection_lock(collection).read():
+            return self._read_generation(collection)
 
 
-    class PassBin:
-        def __init__(self, db_path, bin_name):
-            """
-            :param db_path: Path to the DB
-            :param bin_name: Name of the passbin
-            """
-            self.bin_name = bin_name
-            self.db_path = db_path
-            self.oosome = OsomeDB(self.db_path)
-            if not self.oosome.collection_exists(bin_name):
-                self.print_warning("PASSBIN NOT FOUND")
-                self.make_new_passbin()
+    def get_doc(self,collection,index):
+        """
+        One doc by index , log collections decode only that record
+        :param collection: Collection Name
+        :param index: Index
+        :return: Doc
+        """
+        if index < 0:
+            index += self.count_docs(collection)
+        if index >= 0:
+            for doc in self.get_docs(collection,[index]):
+                return doc
+        raise IndexError("list index out of range")
 
 
-        def print_info(self, data):
-            print(f"{sty.fg(28, 178, 232)}INFO : {data}{sty.fg.rs}")
+    def get_docs(self,collection,positions):
+        """
+        Yields the docs at some positions , in position order. Log collections decode only those records ,
+        paged ones only the pages holding them , small blobs are decoded once , big ones streamed up to the last position
+        :param collection: Collection Name
+        :param positions: Indexes (not negative)
+        :return: Docs (generator)
+        """
+        wanted = sorted(set(positions))
+        if not wanted:
+            return
+        with self.collection_lock(collection).read():
+            db_file = open(self.collection_path(collection), "rb")
+            stat = os.fstat(db_file.fileno())
+            head = db_file.read(len(LOG_MAGIC))
+            if head == PAGE_MAGIC:
+                entries = self._page_directory(db_file)[0]
+        if head == MMAP_MAGIC:
+            db_file.close()
+            # Only the slices of the wanted docs are read from the mapping
+            view, offsets = self._mmap_view(collection)
+            for index in wanted:
+                if index >= len(offsets) - 1:
+                    return
+                yield self._parse(view[offsets[index]:offsets[index + 1]],collection)
+            return
+        with db_file:
+            if head == LOG_MAGIC:
+                live = self._log_live(db_file,stat)[0]
+                for index in wanted:
+                    if index >= len(live):
+                        return
+                    a, b = live[index]
+                    db_file.seek(a)
+                    yield self._parse(self.unpack_data(self._read(db_file,collection,b - a),collection),collection)
+                return
+            if head == PAGE_MAGIC:
+                # Every page holding a wanted doc is decoded once
+                starts = self._page_starts(entries)
+                current = None
+                for index in wanted:
+                    page = bisect.bisect_right(starts, index) - 1
+                    if page < 0 or index - starts[page] >= entries[page][2]:
+                        return
+                    if page != current:
+                        docs = self._page_read(db_file, entries[page])
+                        current = page
+                    yield docs[index - starts[page]]
+                return
+            if stat.st_size <= STREAM_MIN:
+                # One decode for every wanted doc
+                db_file.seek(0)
+                docs = self._parse(self.unpack_data(self._read(db_file,collection),collection),collection)
+                for index in wanted:
+                    if index >= len(docs):
+                        return
+                    yield docs[index]
+                return
+        pending = iter(wanted)
+        target = next(pending)
+        for index, doc in enumerate(self.iter_collection(collection)):
+            if index == target:
+                yield doc
+                target = next(pending, None)
+                if target is None:
+                    return
+
+
+    @traced
+    def count_docs(self,collection):
+        """
+        Number of docs in a collection , from its metadata when up to date (nothing is decoded)
+        :param collection: Collection Name
+        :return: Count
+        """
+        with self.collection_lock(collection).read():
+            meta = self._load_meta(collection)
+            if meta is not None:
+                return meta["count"]
+            storage = self.collection_format(collection)
+            if storage == "log":
+                count = self._log_count(collection)
+            elif storage == "paged":
+                count = self._page_count(collection)
+            elif storage == "mmap":
+                count = len(self._mmap_view(collection)[1]) - 1
+            else:
+                count = sum(1 for e in self.iter_collection(collection))
+            self._save_meta(collection,count,bump=False)
+        return count
 
 
-        def print_warning(self, data):
-            print(f"{sty.fg(242, 74, 68)}WARNING : {data}{sty.fg.rs}")
+    def iter_collection(self,collection):
+        """
+        Yields the docs of a collection without loading them all.
+        Log collections decode one record at a time , paged ones one page at a time ,
+        plain / zlib blobs over STREAM_MIN bytes are parsed while they are read.
+        Encrypted blobs can only be decrypted whole , they are loaded first.
+        The docs are the collection as it was when the iteration started
+        :param collection: Collection Name
+        :return: Docs (generator)
+        """
+        with self.collection_lock(collection).read():
+            # Writes replace the file or append to it , so the open file is a stable snapshot
+            db_file = open(self.collection_path(collection), "rb")
+            stat = os.fstat(db_file.fileno())
+            entries = None
+            head = db_file.read(len(PAGE_MAGIC))
+            if head == PAGE_MAGIC:
+                # Pages are never written over , only the directory read here has to be current
+                entries = self._page_directory(db_file)[0]
+            elif head == MMAP_MAGIC:
+                db_file.close()
+                view, offsets = self._mmap_view(collection)
+        if head == MMAP_MAGIC:
+            for index in range(len(offsets) - 1):
+                yield self._parse(view[offsets[index]:offsets[index + 1]],collection)
+            return
+        with db_file:
+            yield from self._iter_file(db_file,stat,entries)
+
+
+    def _iter_file(self,db_file,stat=None,entries=None):
+        """
+        Yields the docs of an open collection file
+        :param db_file: The collection file (binary)
+        :param stat: os.stat_result of the file taken when it was opened (default : now)
+        :param entries: Pages to read from a paged file (default : every page of its directory)
+        :return: Docs (generator)
+        """
+        collection = os.path.basename(getattr(db_file, "name", "")) if self.db._metrics is not None else None
+        db_file.seek(0)
+        head = db_file.read(len(LOG_MAGIC))
+        if head == MMAP_MAGIC:
+            with self._stage("read",collection):
+                view = memoryview(mmap.mmap(db_file.fileno(), 0, access=mmap.ACCESS_READ))
+                offsets = self._mmap_table(view)
+            for index in range(len(offsets) - 1):
+                yield self._parse(view[offsets[index]:offsets[index + 1]],collection)
+            return
+        if head == PAGE_MAGIC:
+            if entries is None:
+                entries = self._page_directory(db_file)[0]
+            for entry in entries:
+                yield from self._page_read(db_file, entry)
+            return
+        if stat is None:
+            stat = os.fstat(db_file.fileno())
+        if head == LOG_MAGIC:
+            live = self._log_live(db_file,stat)[0]
+            for a, b in live:
+                db_file.seek(a)
+                yield self._parse(self.unpack_data(self._read(db_file,collection,b - a),collection),collection)
+            return
+        db_file.seek(0)
+        # Small blobs are decoded in one go , streaming only pays off for big ones
+        chunks = self._blob_chunks(db_file,collection) if stat.st_size > STREAM_MIN else None
+        if chunks is None:
+            db_file.seek(0)
+            yield from self._parse(self.unpack_data(self._read(db_file,collection),collection),collection)
+            return
+        yield from self._iter_json_array(chunks,collection)
+
+
+    def _blob_chunks(self,db_file,collection=None):
+        """
+        The decoded text of an unencrypted JSON blob , chunk by chunk
+        :param db_file: The blob file (binary) at its start
+        :param collection: Collection name (only used to tag metrics)
+        :return: Generator of str , None when the blob has to be decoded whole (encrypted , not JSON)
+        """
+        first = self._read(db_file,collection,STREAM_CHUNK)
+        if first[:1] == PACK_MAGIC and len(first) > 1:
+            if first[1] & PACK_ENCRYPTED:
+                return None
+            decompress, flush = _decompressor(first[1])
+            first_text = decompress(first[2:])
+        else:
+            # Written before packed payloads had a header : zlib or plain
+            decompress, flush = _decompressor(COMPRESSIONS["zlib"])
+            try:
+                first_text = decompress(first)
+            except zlib.error:
+                decompress, flush = _decompressor(COMPRESSIONS["none"])
+                first_text = first
+        if not first_text.lstrip().startswith(b"["):
+            return None
+
+        def chunks():
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            yield decoder.decode(first_text)
+            while True:
+                chunk = self._read(db_file,collection,STREAM_CHUNK)
+                if not chunk:
+                    break
+                yield decoder.decode(decompress(chunk))
+            yield decoder.decode(flush(), final=True)
+        return chunks()
+
+
+    def _iter_json_array(self,chunks,collection=None):
+        """
+        Parses a JSON array from text chunks , yielding its items one by one.
+        An item going on past the buffer is tried again only once the unparsed text doubled ,
+        so big items are not parsed over and over
+        :param chunks: Iterable of str
+        :param collection: Collection name (only used to tag metrics)
+        :return: Items (generator)
+        """
+        decoder = json.JSONDecoder()
+        buf = ""
+        pos = 0
+        started = False
+        chunks = iter(chunks)
+        eof = False
+        # Length the unparsed text has to reach before the next try
+        want = 0
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf):
+                if not started:
+                    if buf[pos] != "[":
+                        raise ValueError("Not a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buf[pos] == "]":
+                    return
+                try:
+                    with self._stage("parse",collection):
+                        item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    end = None
+                # A value not followed by a delimiter may go on in the next chunk (eg : "1." + "5")
+                if end is not None and (eof or (end < len(buf) and buf[end] in " \t\r\n,]")):
+                    yield item
+                    pos = end
+                    want = 0
+                    continue
+                want = 2 * (len(buf) - pos)
+            if eof:
+                raise ValueError("Truncated JSON array")
+            parts = [buf[pos:]]
+            length = len(parts[0])
+            while True:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    eof = True
+                    break
+                parts.append(chunk)
+                length += len(chunk)
+                if length >= want:
+                    break
+            buf = "".join(parts)
+            pos = 0
+
+
+    def fsync_policy(self):
+        """
+        FSYNC in config.json : "always" (every commit is fsynced) , "batch" (fsynced every FSYNC_BATCH
+        writes or FSYNC_INTERVAL seconds) or "never" (left to the OS)
+        :return: Policy
+        """
+        return get_config(self.db_path).get().get("FSYNC", "always")
+
+
+    def commit_file(self,path,data):
+        """
+        Replaces a collection file through a temp file and os.replace , a crash leaves the old or the new file
+        :param path: File path
+        :param data: Bytes
+        :return: None
+        """
+        policy = self.fsync_policy()
+        metrics = self.db._metrics
+        # "batch" still fsyncs the temp file before the rename (a crash never leaves a short file) ,
+        # only the directory fsync making the rename durable is left to the batch
+        fsync = policy != "never"
+        if metrics is None:
+            atomic_write(path, data, fsync=fsync, fsync_directory=policy == "always")
+        else:
+            start = time.perf_counter()
+            atomic_write(path, data, fsync=fsync, fsync_directory=policy == "always")
+            metrics.observe("write", os.path.basename(path), time.perf_counter() - start)
+            metrics.count("bytes_written", os.path.basename(path), len(data))
+        if policy == "batch":
+            self._sync_later()
+
+
+    def _sync_later(self,path=None):
+        """
+        Adds a write to the current batch ("batch" FSYNC policy). A timer syncs the batch FSYNC_INTERVAL
+        seconds after its first write , and the batch left at exit is synced too
+        :param path: File written in place , to fsync with the batch (None : a file replaced by commit_file)
+        :return: None
+        """
+        settings = get_config(self.db_path).get()
+        interval = settings.get("FSYNC_INTERVAL", FSYNC_INTERVAL)
+        db = self.db
+        with db._sync_lock:
+            if path is not None:
+                db._pending_sync.add(path)
+            db._pending_writes += 1
+            _PENDING_SYNC[id(db)] = db
+            due = db._pending_writes >= settings.get("FSYNC_BATCH", FSYNC_BATCH) or \
+                time.monotonic() - db._last_sync >= interval
+            if not due and db._sync_timer is None:
+                db._sync_timer = threading.Timer(interval, db.sync)
+                db._sync_timer.daemon = True
+                db._sync_timer.start()
+        if due:
+            self.sync()
+
+
+    def sync(self):
+        """
+        fsyncs every file written since the last batch boundary ("batch" FSYNC policy)
+        :return: None
+        """
+        db = self.db
+        with db._sync_lock:
+            pending = db._pending_sync
+            writes = db._pending_writes
+            db._pending_sync = set()
+            db._pending_writes = 0
+            db._last_sync = time.monotonic()
+            _PENDING_SYNC.pop(id(db), None)
+            if db._sync_timer is not None:
+                db._sync_timer.cancel()
+                db._sync_timer = None
+        for path in pending:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if writes:
+            fsync_dir(self.db_path)
+
+
+    def recover_collection(self,collection):
+        """
+        Cuts a log collection back to its last complete record (a crash can leave half a record , or a torn one
+        failing its CRC , at the end) , or a paged one back to its last directory whose pages all pass their CRC
+        (pages of a commit that never flipped it , or a torn commit)
+        :param collection: Collection Name
+        :return: True if something was cut
+        """
+        with self.collection_lock(collection).write():
+            if not os.path.exists(self.collection_path(collection)):
+                return False
+            storage = self.collection_format(collection)
+            if storage not in ("log", "paged"):
+                return False
+            with open(self.collection_path(collection), "r+b") as db_file:
+                size = os.fstat(db_file.fileno()).st_size
+                flipped = False
+                if storage == "log":
+                    end = self._log_scan(db_file.read())[2]
+                else:
+                    entries, slot, end = self._page_directory(db_file,verify=True)
+                    db_file.seek(len(PAGE_MAGIC))
+                    if db_file.read(1)[0] != slot:
+                        # Back to the previous commit
+                        db_file.seek(len(PAGE_MAGIC))
+                        db_file.write(bytes([slot]))
+                        flipped = True
+                if end >= size and not flipped:
+                    return False
+                db_file.truncate(end)
+                db_file.flush()
+                os.fsync(db_file.fileno())
+        self.print_warning("Collection `%s` : dropped an incomplete commit (%d bytes)", collection, size - end)
+        return True
+
+
+    def is_aux_file(self,file_name,collections):
+        """
+        Checks if a file in the DB folder belongs to a collection (eg : its index)
+        :param file_name: Name of the file
+        :param collections: Names of the collections
+        :return: True / False
+        """
+        for suffix in AUX_SUFFIXES:
+            if file_name.startswith(".") and file_name.endswith(suffix):
+                if file_name[1:-len(suffix)] in collections:
+                    return True
+        return False
+
+
+    def _index_path(self,collection):
+        return os.path.join(self.db_path, f".{collection}{INDEX_SUFFIX}")
+
+
+    def get_indexes(self,collection):
+        """
+        :param collection: Collection Name
+        :return: The indexes registered for a collection {key : {"unique" : True / False}}
+        """
+        return self.get_collection_options(collection).get("indexes", {})
+
+
+    def create_index(self,collection,key,unique=False):
+        """
+        Makes a key -> positions index , kept in .<collection>.idx and used by lookups
+        :param collection: Collection Name
+        :param key: Key to index
+        :param unique: Reject docs with a value already in the index
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            data = self.load_collection(collection)
+            index = self._build_index(data,key,unique)
+            with self.config_lock().write():
+                settings = self.get_settings()
+                options = settings.setdefault("collection_options", {}).setdefault(collection, {})
+                options.setdefault("indexes", {})[key] = {"unique": unique}
+                self.write_settings(settings)
+            indexes = self._load_indexes(collection)
+            indexes[key] = index
+            self._save_indexes(collection,indexes)
+
+
+    def drop_index(self,collection,key):
+        """
+        Removes an index
+        :param collection: Collection Name
+        :param key: Indexed key
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            with self.config_lock().write():
+                settings = self.get_settings()
+                options = settings.get("collection_options", {}).get(collection, {})
+                options.get("indexes", {}).pop(key, None)
+                self.write_settings(settings)
+            if options.get("indexes"):
+                self.rebuild_indexes(collection)
+            elif os.path.exists(self._index_path(collection)):
+                os.remove(self._index_path(collection))
+
+
+    @traced
+    def rebuild_indexes(self,collection,data=None):
+        """
+        Builds every index of a collection again from its docs
+        :param collection: Collection Name
+        :param data: The docs if already loaded
+        :return: None
+        """
+        with self.collection_lock(collection).write():
+            if data is None:
+                data = self.load_collection(collection)
+            indexes = self._build_indexes(collection,data)
+            if indexes:
+                self._save_indexes(collection,indexes)
+
+
+    def index_lookup(self,collection,key,val):
+        """
+        Positions of the docs with doc[key] == val , through the index
+        :param collection: Collection Name
+        :param key: Key
+        :param val: Value
+        :return: Positions , None if the key is not indexed
+        """
+        if key not in self.get_indexes(collection):
+            return None
+        with self.collection_lock(collection).read():
+            index = self._load_indexes(collection,shared=True)[key]
+        return list(index["entries"].get(self._index_value({key: val}, key), []))
+
+
+    def _index_value(self,doc,key):
+        # Values equal for match_filter (==) get the same entry : True / 1 / 1.0 , NaN equals nothing
+        if not isinstance(doc, dict) or key not in doc:
+            return None
+        val = doc[key]
+        if isinstance(val, float) and val != val:
+            return None
+        return json.dumps(_index_normal(val), sort_keys=True)
+
+
+    def _build_index(self,data,key,unique):
+        index = {"unique": unique, "values": [], "entries": {}}
+        for doc in data:
+            self._index_insert(index,key,doc)
+        return index
+
+
+    def _build_indexes(self,collection,data):
+        return {key: self._build_index(data,key,e["unique"]) for key, e in self.get_indexes(collection).items()}
+
+
+    def _index_insert(self,index,key,doc):
+        val = self._index_value(doc,key)
+        if val is not None:
+            if index["unique"] and val in index["entries"]:
+                raise Exception(f"Error : Duplicate value {val} for the unique index `{key}`")
+            index["entries"].setdefault(val, []).append(len(index["values"]))
+        index["values"].append(val)
+
+
+    def _index_replace(self,index,key,position,doc):
+        old = index["values"][position]
+        val = self._index_value(doc,key)
+        if val == old:
+            return
+        if val is not None:
+            if index["unique"] and val in index["entries"]:
+                raise Exception(f"Error : Duplicate value {val} for the unique index `{key}`")
+            bisect.insort(index["entries"].setdefault(val, []), position)
+        if old is not None:
+            index["entries"][old].remove(position)
+            if not index["entries"][old]:
+                del index["entries"][old]
+        index["values"][position] = val
+
+
+    def _index_delete(self,index,positions):
+        for position in sorted(positions, reverse=True):
+            del index["values"][position]
+        entries = {}
+        for pos, val in enumerate(index["values"]):
+            if val is not None:
+                entries.setdefault(val, []).append(pos)
+        index["entries"] = entries
+
+
+    def _load_indexes(self,collection,shared=False):
+        """
+        Loads the indexes of a collection , rebuilding them if the collection changed behind their back
+        :param collection: Collection Name
+        :param shared: Return the parsed indexes kept in memory (until the collection file changes) , read only
+        :return: {key : index}
+        """
+        registered = self.get_indexes(collection)
+        if not registered:
+            return {}
+        if shared:
+            cached = self.db._indexes.get(self.collection_path(collection))
+            if cached is not None and cached[0] == self._collection_state(collection) and set(cached[1]) == set(registered):
+                return cached[1]
+        stored = None
+        try:
+            with open(self._index_path(collection), "rb") as index_file:
+                stored = json.loads(self.unpack_data(index_file.read(),collection))
+        except FileNotFoundError:
+            pass
+        if stored is None or stored.get("version") != INDEX_VERSION or stored["state"] != self._collection_state(collection) \
+                or set(stored["indexes"]) != set(registered):
+            indexes = self._build_indexes(collection,self.load_collection(collection))
+            self._save_indexes(collection,indexes)
+            # The saved indexes are kept in memory , the caller gets its own to change
+            return indexes if shared else copy.deepcopy(indexes)
+        if shared:
+            self.db._indexes[self.collection_path(collection)] = (stored["state"], stored["indexes"])
+        return stored["indexes"]
+
+
+    def _save_indexes(self,collection,indexes):
+        # Callers are done changing indexes once they save them , they become the in-memory copy
+        data = {"version": INDEX_VERSION, "state": self._collection_state(collection), "indexes": indexes}
+        self.db._indexes[self.collection_path(collection)] = (data["state"], indexes)
+        # Readers may rebuild a stale index at the same time , each one writes its own temp file and swaps it in.
+        # Not fsynced : an index older than its collection is rebuilt
+        atomic_write(self._index_path(collection), self.pack_data(json.dumps(data).encode(),None,collection), fsync=False)
+
+
+    def _collection_state(self,collection):
+        # The inode changes with every atomic_write , even within the mtime resolution
+        stat = os.stat(self.collection_path(collection))
+        return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+
+
+    def delete_collection(self,collection):
+        """
+        Deletes a Collection
+        :param collection: Collection Name
+        :return: None
+        """
+        try:
+            with self.collection_lock(collection).write():
+                os.remove(self.collection_path(collection))
+                self.db._mmaps.pop(self.collection_path(collection), None)
+                self.db._indexes.pop(self.collection_path(collection), None)
+                for e in os.listdir(self.db_path):
+                    if self.is_aux_file(e, [collection]):
+                        os.remove(os.path.join(self.db_path, e))
+        except:
+            raise Exception("Error : Error While Deleting The Collection")
+
+
+    def get_collection_size(self,collection):
+        """
+        Gets the size of the Collection
+        :param collection: Collection Name
+        :return: Size
+        """
+        try:
+            size = os.path.getsize(self.collection_path(collection))
+        except:
+            raise Exception("Error : Error While Getting The Collection Size")
+        return size
+
+
+    def password_to_key(self,password):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+        salt = b'.-Kh)ura/)\xcef\xc8\x88u\xc2'
+        password = password.encode()
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100000, backend=default_backend())
+        key = base64.urlsafe_b64encode(kdf.derive(password))
+        return key
+
+
+    def get_fernet(self,password):
+        """
+        Gives the Fernet obj for a password , the key is derived only once per process
+        :param password: Password
+        :return: Fernet
+        """
+        cache_key = (os.path.abspath(self.db_path), hashlib.sha256(password.encode()).hexdigest())
+        enc_ = _KEY_CACHE.get(cache_key)
+        metrics = self.db._metrics
+        if enc_ is None:
+            if metrics is not None:
+                start = time.perf_counter()
+            from cryptography.fernet import Fernet
+            enc_ = Fernet(self.password_to_key(password))
+            if metrics is not None:
+                metrics.observe("kdf", None, time.perf_counter() - start)
+                metrics.count("key_cache_misses")
+            with _KEY_CACHE_LOCK:
+                _KEY_CACHE[cache_key] = enc_
+        elif metrics is not None:
+            metrics.count("key_cache_hits")
+        return enc_
+
+
+    def clear_key_cache(self):
+        """
+        Wipes the derived keys of this DB from memory
+        :return: None
+        """
+        clear_key_cache(self.db_path)
+
+
+    def compress(self,data):
+        data_ = zlib.compress(data)
+        if len(data_) < len(data):
+            final = data_
+        else:
+            final = data
+        return final
+
+
+    def de_compress(self,data):
+        try:
+            data_ = zlib.decompress(data)
+            return data_
+        except:
+            return data
+
+
+    def print_info(self, data, *args):
+        logger.info(data, *args)
+
+
+    def print_warning(self, data, *args):
+        logger.warning(data, *args)
+
+
+    class PassBin:
+        def __init__(self, db_path, bin_name, db=None):
+            """
+            :param db_path: Path to the DB
+            :param bin_name: Name of the passbin
+            :param db: The OsomeDB to share (default : the one already opened for db_path , else a new one)
+            """
+            self.bin_name = bin_name
+            self._cache = None
+            self.oosome = db if db is not None else OsomeDB.open(db_path)
+            self.db_path = self.oosome.db_path
+            if not self.oosome.collection_exists(bin_name):
+                self.print_warning("PASSBIN %s NOT FOUND", bin_name)
+                self.make_new_passbin()
+
+
+        def print_info(self, data, *args):
+            logger.info(data, *args)
+
+
+        def print_warning(self, data, *args):
+            logger.warning(data, *args)
+
+
+        def bin_lock(self):
+            """
+            The reader/writer lock of the PassBin
+            :return: RWLock
+            """
+            return self.oosome.collection_lock(self.bin_name)
+
+
+        def passbin_exists(self,bin_name):
+            """
+            Shows if a PassBin exists
+            :param bin_name: Name of the passbin
+            :return: True / False
+            """
+            result = os.path.exists(f"{self.db_path}/{bin_name}")
+            return result
+
+
+        def make_new_passbin(self):
+            self.print_info("PASSBIN %s MADE", self.bin_name)
+            self.oosome.make_collection(self.bin_name)
+            self.oosome.create_index(self.bin_name,"Id")
+
+
+        def get_pass_bin(self):
+            """
+            :return: The passbin
+            """
+            try:
+                bin = self.oosome.load_collection(self.bin_name)
+                return bin
+            except:
+                raise Exception("Error While Reading PassBin")
+
+
+        def write_pass_bin(self,data):
+            """
+            Rewrite the passbin
+            :param data: New PASSBIN DATA
+            :return: None
+            """
+            try:
+               self.oosome.write_collection(self.bin_name,data)
+            except:
+                raise Exception("Error While Writing PassBin")
+
+
+        def __len__(self):
+            return len(self.get_pass_bin())
+
+
+        def __str__(self):
+            return f"Name : {self.bin_name}"
+
+
+        def __repr__(self):
+            return f"Name : {self.bin_name} Len : {len(self.get_pass_bin())}"
+
+
+        def __add__(self, other):
+            new_collection = self.get_pass_bin()
+            new_collection.append(other)
+            return new_collection
+
+
+        def __sub__(self, other):
+            try:
+                new_collection = self.get_pass_bin()
+                new_collection.remove(other)
+                return new_collection
+            except:
+                raise Exception(f"Error : `{other}` Not found in the PassBin `{self.bin_name}`")
+
+
+        def __iadd__(self, other):
+            with self.bin_lock().write():
+                new_pass_bin = self.get_pass_bin()
+                new_pass_bin.append(other)
+                self.write_pass_bin(new_pass_bin)
+            return self
+
+
+        def __isub__(self, other):
+            try:
+                with self.bin_lock().write():
+                    pass_bin  = self.get_pass_bin()
+                    pass_bin.remove(other)
+                    self.write_pass_bin(pass_bin)
+                return self
+            except:
+                raise Exception(f"Error : `{other}` Not found in the PassBin `{self.bin_name}`")
+
+
+        def __int__(self):
+            return len(self.get_pass_bin())
+
+
+        def delete_bin(self):
+            """
+            Deletes the PassBin
+            :return: None
+            """
+            self.oosome.delete_collection(self.bin_name)
+            self.print_info("PASSBIN %s DELETED", self.bin_name)
+
+
+        def __bool__(self):
+            return True
+
+
+        def get_passbin_size(self,bin_name):
+            """
+            Give the size of the passbin
+            :param bin_name: PassBin Name
+            :return: Size
+            """
+            try:
+                size = os.path.getsize(os.path.join(self.db_path, bin_name))
+            except:
+                raise Exception("Error : Error While Getting The PassBin's Size")
+            return size
+
+
+        def __sizeof__(self):
+            return self.get_passbin_size(self.bin_name)
+
+
+        def append_new_pass(self, Id, Password):
+            """
+            Appends New Password
+            :param Id: Id of the Password
+            :param Password: Password
+            :return: None
+            """
+            with self.bin_lock().write():
+                col_data = self.get_pass_bin()
+                col_data.append({"Id":Id,"Password":self.custom_hash(Password)})
+                self.write_pass_bin(col_data)
+
+
+        def append_many_pass(self, pairs):
+            """
+            Appends many passwords with one load and one commit
+            :param pairs: [(Id , Password) ...] or {Id : Password}
+            :return: None
+            """
+            if isinstance(pairs, dict):
+                pairs = pairs.items()
+            new_passes = [{"Id":Id,"Password":self.custom_hash(Password)} for Id, Password in pairs]
+            with self.bin_lock().write():
+                col_data = self.get_pass_bin()
+                col_data.extend(new_passes)
+                self.write_pass_bin(col_data)
+
+
+        def remove(self,Id):
+            """
+            Removes a password form PassBin which have the provided Id
+            :param Id: Id of the Password
+            :return: None
+            """
+            try:
+                with self.bin_lock().write():
+                    pass_bin = self.get_pass_bin()
+                    pass_bin.remove(self.search_by_Id(Id)[1])
+                    self.write_pass_bin(pass_bin)
+            except:
+                raise Exception(f"Error : `{Id}` Not found in the PassBin `{self.bin_name}`")
+
+
+        def reset_pass(self, Id, Password):
+            """
+            Reset a Password By Given Id
+            :param Id: Id of the Password
+            :param Password: New Password
+            :return: None
+            """
+            with self.bin_lock().write():
+                col_data = self.get_pass_bin()
+                elem = self.search_by_Id(Id)
+                col_data[elem[0]] = {"Id":Id,"Password":self.custom_hash(Password)}
+                self.write_pass_bin(col_data)
+
+
+        def custom_hash(self,data,salt=None,iterations=None):
+            """
+            Salted PBKDF2-SHA256 hash of a password
+            :param data: Password
+            :param salt: Salt (default : a new random one)
+            :param iterations: Cost (default : PASS_ITERATIONS in config.json , else 100000)
+            :return: "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>"
+            """
+            if salt is None:
+                import secrets
+                salt = secrets.token_bytes(PASS_SALT_BYTES)
+            if iterations is None:
+                iterations = get_config(self.db_path).get().get("PASS_ITERATIONS", PASS_ITERATIONS)
+            result = hashlib.pbkdf2_hmac("sha256", data.encode(), salt, iterations)
+            return f"{PASS_SCHEME}${iterations}${salt.hex()}${result.hex()}"
+
+
+        def check_hash(self,data,stored):
+            """
+            Checks a password against a stored hash (salted ones , or the unsalted SHA-256 of older PassBins)
+            :param data: Password
+            :param stored: Stored hash
+            :return: True / False
+            """
+            parts = str(stored).split("$")
+            if len(parts) == 4 and parts[0] == PASS_SCHEME:
+                result = self.custom_hash(data,bytes.fromhex(parts[2]),int(parts[1]))
+            else:
+                result = hashlib.sha256(data.encode()).hexdigest()
+            return hmac.compare_digest(result.encode(), str(stored).encode())
+
+
+        def _records(self):
+            """
+            {Id : (index , item)} of the whole PassBin , decoded once and kept until the file changes
+            :return: Records
+            """
+            state = self.oosome._collection_state(self.bin_name)
+            cached = self._cache
+            metrics = self.oosome.db._metrics
+            if cached is not None and cached[0] == state:
+                if metrics is not None:
+                    metrics.count("passbin_cache_hits", self.bin_name)
+                return cached[1]
+            if metrics is not None:
+                metrics.count("passbin_cache_misses", self.bin_name)
+            with self.bin_lock().read():
+                state = self.oosome._collection_state(self.bin_name)
+                records = {}
+                for index, e in enumerate(self.get_pass_bin()):
+                    records.setdefault(e["Id"], (index, e))
+            self._cache = (state, records)
+            return records
+
+
+        def verify(self,Id,Password):
+            """
+            Checks a password , the PassBin stays decoded in memory between calls
+            :param Id: Id of the Password
+            :param Password: Password
+            :return: True / False (False for an unknown Id)
+            """
+            found = self._records().get(Id)
+            if found is None:
+                return False
+            return self.check_hash(Password,found[1]["Password"])
+
+
+        def search_by_Id(self,Id):
+            """
+            Search a Password By Id
+            :param Id: Id of the password
+            :return: Index , Item
+            """
+            cached = self._cache
+            if cached is not None and cached[0] == self.oosome._collection_state(self.bin_name):
+                return cached[1].get(Id)
+            if "Id" in self.oosome.get_indexes(self.bin_name):
+                # Only the indexed doc is decoded , a stale index is rebuilt by index_lookup
+                with self.bin_lock().read():
+                    positions = sorted(self.oosome.index_lookup(self.bin_name,"Id",Id))
+                    for position, item in zip(positions, self.oosome.get_docs(self.bin_name,positions)):
+                        if item["Id"] == Id:
+                            return (position, item)
+                return None
+            for index, e in enumerate(self.get_pass_bin()):
+                if e["Id"] == Id:
+                    return (index, e)
+
+
+        def create_index(self,unique=False):
+            """
+            Indexes the Ids of the PassBin (new PassBins are indexed already)
+            :param unique: Reject a second password with the same Id
+            :return: None
+            """
+            self.oosome.create_index(self.bin_name,"Id",unique)
+
+
+    class Settings:
+        def __init__(self,db_path):
+            """
+            :param db_path: The path to the DB
+            """
+            self.db_path = os.path.abspath(db_path)
+
+
+        def change(self,key,value):
+            """
+            Change The VALUE of a key in config.json
+            :param key: Key
+            :param value: New Value
+            :return: None
+            """
+            with get_lock(self.db_path, CONFIG_FILE).write():
+                settings = self.get_settings()
+                settings[key]=value
+                self.write_settings(settings)
+            if key == "ENC":
+                clear_key_cache(self.db_path)
+
+
+        def give_setting_info(self):
+            """
+            Gives Info about what all setting are available
+            :return: Info
+            """
+            info = """
+    Config File (json) :
+    - > DB_NAME
+    - > Date Created
+    - > List of collections
+    - > enc
+    - > VERSION (bumped on every write)
+    - > STORAGE (default storage of new collections : blob / log / paged / mmap , default blob)
+        blob : one file rewritten on every write , log : records appended , compacted once most of them are dead ,
+        paged : pages of docs behind a directory , a write only adds the pages it changed ,
+        mmap : memory mapped , read in place (never encrypted)
+    - > CODEC (default codec of the collections : json / msgpack / marshal / pickle , default json)
+    - > COMPRESSION (default compression : none / zlib / lzma / bz2 , with a level like "zlib:9" , default zlib)
+    - > FSYNC (always / batch / never , default always)
+    - > FSYNC_BATCH , FSYNC_INTERVAL ("batch" syncs every 32 writes or 1 second by default)
+    - > WORKERS (pool size of the DB wide operations , default : the number of CPUs)
+    - > POOL (thread / process , default thread , process applies to reencrypt / recompress only)
+    - > PASS_ITERATIONS (PBKDF2 cost of new PassBin hashes , default 100000)
+    - > collection_options (per collection options : storage , codec , compression , indexes , page_docs)
+            """
+            return info
+
+
+        def get(self,key):
+            """
+            Get the value of a Key
+            :param key: Key
+            :return: Value
+            """
+            return copy.deepcopy(get_config(self.db_path).get()[key])
+
+
+        def get_settings(self):
+            """
+            Loads the settings
+            :return: Settings
+            """
+            return get_config(self.db_path).read()
+
+
+        def write_settings(self, settings):
+            """
+            Rewrites the settings
+            :param settings: New Settings
+            :return: None
+            """
+            get_config(self.db_path).write(settings)
+            db = _DBS.get(self.db_path)
+            if db is not None:
+                db._refresh(settings)
+
+
+class Collection(OsomeDB):
+    def __init__(self,db_path,collection,cache=False,flush_ops=None,flush_interval=None,db=None):
+        """
+        :param db_path: Path to the DB
+        :param collection: Name of the Collection
+        :param cache: Keep the docs in memory and write them back on flush()
+        :param flush_ops: Flush after this many writes (cache mode)
+        :param flush_interval: Flush when this many seconds passed since the last flush (cache mode)
+        :param db: The OsomeDB to share (default : the one already opened for db_path , else a new one)
+        """
+        self._db = db if db is not None else OsomeDB.open(db_path)
+        self.db_path = self._db.db_path
+        self.collection_name = collection
+        self.cache = cache
+        self.flush_ops = flush_ops
+        self.flush_interval = flush_interval
+        self._docs = None
+        self._file_stat = None
+        self._dirty_ops = 0
+        self._last_flush = time.monotonic()
+        self._cache_lock = threading.RLock()
+        self._flush_timer = None
+        self._batch = threading.local()
+
+
+    @property
+    def db(self):
+        """
+        The OsomeDB the handle belongs to
+        """
+        return self._db
+
+
+    @property
+    def db_name(self):
+        return self._db.db_name
+
+
+    @property
+    def enc(self):
+        return self._db.enc
+
+
+    @property
+    def collections(self):
+        return self._db.collections
+
+
+    @property
+    def _handles(self):
+        return self._db._handles
+
+
+    def __len__(self):
+        return self.count()
+
+
+    def __iter__(self):
+        return self.iter_docs()
+
+
+    def __str__(self):
+        return f"Name : {self.collection_name}"
+
+
+    def __repr__(self):
+        return f"Name : {self.collection_name} Len : {len(self._data())}"
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+
+    def __add__(self, other):
+        new_collection = self.read_collection_data()
+        new_collection.append(other)
+        return new_collection
+
+
+    def __sub__(self, other):
+        try:
+            new_collection = self.read_collection_data()
+            new_collection.remove(other)
+            return new_collection
+        except:
+            raise Exception(f"Error : `{other}` Not found in the Collection `{self.collection_name}`")
+
+
+    def __iadd__(self, other):
+        if self._deferred():
+            new_collection = self._data()
+            new_collection.append(other)
+            self._commit(new_collection)
+            return self
+        self.append_docs(self.collection_name,[other])
+        return self
+
+
+    def __isub__(self, other):
+        with self.collection_lock(self.collection_name).write():
+            try:
+                new_collection = self._data()
+                index = new_collection.index(other)
+            except:
+                raise Exception(f"Error : `{other}` Not found in the Collection `{self.collection_name}`")
+            if self._deferred() or self.get_storage(self.collection_name) == "blob":
+                del new_collection[index]
+                self._commit(new_collection)
+            else:
+                self.delete_doc(self.collection_name,index)
+        return self
+
+
+    def __int__(self):
+        return self.count()
+
+
+    def delete(self):
+        with self._cache_lock:
+            self._docs = None
+            self._clean()
+        self.delete_collection(self.collection_name)
+
+
+    def __bool__(self):
+        return True
+
+
+    def __sizeof__(self):
+        return self.get_collection_size(self.collection_name)
+
+
+    def _file_state(self):
+        try:
+            stat = os.stat(self.collection_path(self.collection_name))
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+    def _data(self):
+        """
+        The docs to work on , the resident list in cache mode or a freshly loaded one
+        :return: Collection Data
+        """
+        batch_docs = getattr(self._batch, "docs", None)
+        if batch_docs is not None:
+            return batch_docs
+        if not self.cache:
+            return self.load_collection(self.collection_name)
+        if self._docs is None:
+            self.reload()
+        elif self._file_state() != self._file_stat:
+            if self._dirty_ops:
+                self.print_warning("Collection `%s` changed on disk , keeping the unflushed docs", self.collection_name)
+            else:
+                self.reload()
+        self._auto_flush()
+        return self._docs
+
+
+    def _commit(self,data):
+        """
+        Saves the docs , in cache mode the write is deferred until the next flush
+        :param data: New Data
+        :return: None
+        """
+        if getattr(self._batch, "docs", None) is not None:
+            self._batch.docs = data
+            self._batch.dirty = True
+            return
+        if not self.cache:
+            self.write_collection(self.collection_name,data)
+            return
+        with self._cache_lock:
+            self._docs = data
+            self._dirty_ops += 1
+            _DIRTY_HANDLES[id(self)] = self
+        self._auto_flush()
+        with self._cache_lock:
+            if self._dirty_ops and self.flush_interval is not None and self._flush_timer is None:
+                # An idle handle is flushed by the timer , not by its next operation
+                delay = max(0, self.flush_interval - (time.monotonic() - self._last_flush))
+                self._flush_timer = threading.Timer(delay, self._flush_due)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+
+    def _deferred(self):
+        """
+        :return: True if writes go to memory first (cache mode , or a batch of this thread)
+        """
+        return self.cache or getattr(self._batch, "docs", None) is not None
+
+
+    def _unsaved(self):
+        """
+        :return: True if there are docs in memory not written yet
+        """
+        return bool(self._dirty_ops) or getattr(self._batch, "dirty", False)
+
+
+    def _auto_flush(self):
+        if not self._dirty_ops:
+            return
+        if self.flush_ops is not None and self._dirty_ops >= self.flush_ops:
+            self.flush()
+        elif self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+
+    def _flush_due(self):
+        """
+        Runs on the timer armed when the handle became dirty (flush_interval)
+        """
+        with self._cache_lock:
+            self._flush_timer = None
+        self.flush()
+
+
+    def _clean(self):
+        """
+        Forgets the unflushed changes (no write left for the timer or the exit) , called with _cache_lock held
+        """
+        self._dirty_ops = 0
+        _DIRTY_HANDLES.pop(id(self), None)
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+
+    def reload(self):
+        """
+        Drops the cached docs (and unflushed changes) and loads them again
+        :return: None
+        """
+        file_stat = self._file_state()
+        docs = self.load_collection(self.collection_name)
+        with self._cache_lock:
+            self._file_stat, self._docs = file_stat, docs
+            self._clean()
+
+
+    def flush(self):
+        """
+        Writes the cached docs back if they were changed
+        :return: None
+        """
+        if self._dirty_ops:
+            # The collection lock keeps flushes (eg : the timer's) one at a time , _cache_lock is never
+            # held while waiting for it
+            with self.collection_lock(self.collection_name).write():
+                with self._cache_lock:
+                    docs, ops = self._docs, self._dirty_ops
+                if ops:
+                    self.write_collection(self.collection_name,docs)
+                    with self._cache_lock:
+                        self._file_stat = self._file_state()
+                        # Changes made during the write stay dirty
+                        self._dirty_ops -= ops
+                        if not self._dirty_ops:
+                            self._clean()
+        self._last_flush = time.monotonic()
+
+
+    def read_collection_data(self):
+        """
+        Gives the collection data
+        :return: Collection Data
+        """
+        if self._deferred():
+            return list(self._data())
+        return self.load_collection(self.collection_name)
+
+
+    def rewrite_collection_data(self,data):
+        """
+        Rewrites the Collection
+        :param data: New Data
+        :return: None
+        """
+        self._commit(list(data) if self._deferred() else data)
+
+
+    def iter_docs(self):
+        """
+        Yields the docs one by one without loading the whole collection (see OsomeDB.iter_collection)
+        :return: Docs (generator)
+        """
+        if self._deferred():
+            return iter(list(self._data()))
+        return self.iter_collection(self.collection_name)
+
+
+    def count(self,filter=None):
+        """
+        Number of docs (matching a filter). Without a filter it comes from the collection's metadata ,
+        a filter on one indexed key is answered from the index alone
+        :param filter: Filter (see match_filter)
+        :return: Count
+        """
+        if not filter:
+            if self._deferred():
+                return len(self._data())
+            return self.count_docs(self.collection_name)
+        plan = self._query_plan(filter)
+        if plan["plan"] == "index" and list(filter) == [plan["key"]]:
+            # Only a plain equality is answered by the index alone , other operators on the key still filter
+            cond = filter[plan["key"]]
+            if not (isinstance(cond, dict) and cond and all(str(e).startswith("$") for e in cond)) or list(cond) == ["$eq"]:
+                return len(plan["positions"])
+        return sum(1 for e in self._candidates(plan) if match_filter(e, filter))
+
+
+    def _query_plan(self,filter):
+        """
+        Picks an index for a filter : the first indexed key compared with $eq / $in (or a plain value)
+        :param filter: Filter
+        :return: {"plan" : "index" / "scan" , ...}
+        """
+        if filter and not self._unsaved():
+            indexes = self.get_indexes(self.collection_name)
+            for key, cond in filter.items():
+                if key not in indexes:
+                    continue
+                if isinstance(cond, dict) and cond and all(str(e).startswith("$") for e in cond):
+                    if "$eq" in cond:
+                        values = [cond["$eq"]]
+                    elif "$in" in cond:
+                        values = list(cond["$in"])
+                    else:
+                        continue
+                else:
+                    values = [cond]
+                positions = set()
+                for val in values:
+                    positions.update(self.index_lookup(self.collection_name,key,val))
+                return {"plan": "index", "key": key, "positions": sorted(positions)}
+        return {"plan": "scan"}
+
+
+    def _candidates(self,plan):
+        if plan["plan"] == "index":
+            return self.get_docs(self.collection_name,plan["positions"])
+        return self.iter_docs()
+
+
+    def find(self,filter=None,projection=None,sort=None,limit=None):
+        """
+        Finds the docs matching a filter , through an index when one fits.
+        Without sort the search stops as soon as limit docs were found
+        :param filter: Filter (see match_filter) , None matches every doc
+        :param projection: None , [keys to keep] , {key : 1} to keep or {key : 0} to drop
+        :param sort: "key" , [("key" , 1 / -1) ...] or {"key" : 1 / -1}
+        :param limit: Max number of docs
+        :return: Docs
+        """
+        found = (e for e in self._candidates(self._query_plan(filter)) if match_filter(e, filter))
+        if sort is not None:
+            found = sort_docs(found, sort)
+        result = []
+        for doc in found:
+            if limit is not None and len(result) >= limit:
+                break
+            result.append(project(doc, projection))
+        return result
+
+
+    def find_one(self,filter=None,projection=None,sort=None):
+        """
+        The first doc matching a filter
+        :param filter: Filter (see match_filter)
+        :param projection: See find
+        :param sort: See find
+        :return: Doc , None if nothing matched
+        """
+        found = self.find(filter,projection,sort,limit=1)
+        return found[0] if found else None
+
+
+    def explain(self,filter=None):
+        """
+        Tells how find / count would run a filter
+        :param filter: Filter (see match_filter)
+        :return: {"plan" : "index" / "scan" , "key" , "candidates" , "storage"}
+        """
+        plan = self._query_plan(filter)
+        result = {"plan": plan["plan"], "storage": self.get_storage(self.collection_name)}
+        if plan["plan"] == "index":
+            result["key"] = plan["key"]
+            result["candidates"] = len(plan["positions"])
+        return result
+
+
+    def get_indexof(self,data):
+        """
+        Get The index of a given doc
+        :param data: Doc's data
+        :return: Index
+        """
+        return self._data().index(data)
+
+
+    def get_byindex(self,index):
+        """
+        Gets a Doc By Index
+        :param index: Index
+        :return: Doc
+        """
+        if self._deferred():
+            return self._data()[index]
+        return self.get_doc(self.collection_name,index)
+
+
+    def search_by_key_val(self,key_name,val):
+        """
+        Search using the value of a given key
+        :param key_name: Name of the key
+        :param val: Value
+        :return: Index , Doc
+        """
+        if not self._unsaved() and key_name in self.get_indexes(self.collection_name):
+            # A stale index is rebuilt by index_lookup , under the lock it stays in step with the docs
+            with self.collection_lock(self.collection_name).read():
+                positions = sorted(self.index_lookup(self.collection_name,key_name,val))
+                # Every hit comes from one pass over the collection
+                for position, doc in zip(positions, self.get_docs(self.collection_name,positions)):
+                    if doc[key_name] == val:
+                        return (position,doc)
+            return None
+        for index, e in enumerate(self.iter_docs()):
+            if isinstance(e, dict) and key_name in e and e[key_name] == val:
+                return (index,e)
+
+
+    def get_versioned(self,index):
+        """
+        Gets a Doc By Index with its version , for rewrite_doc / update_doc (expected_version)
+        :param index: Index
+        :return: Doc , Version
+        """
+        doc = self.get_byindex(index)
+        return (doc,doc_version(doc))
+
+
+    def rewrite_doc(self,index,new_data,expected_version=None):
+        """
+        Rewrites a doc with given Index
+        :param index: Index
+        :param new_data: New Doc Data
+        :param expected_version: Version the doc must still have (see get_versioned) , else ConflictError is raised
+        :return: Version of the new doc
+        """
+        version = doc_version(new_data)
+        # The lock is only held to check the version and write
+        with self.collection_lock(self.collection_name).write():
+            if expected_version is not None and doc_version(self.get_byindex(index)) != expected_version:
+                raise ConflictError(f"Error : Doc {index} of `{self.collection_name}` changed since version {expected_version}")
+            if not self._deferred():
+                self.replace_doc(self.collection_name,index,new_data)
+            else:
+                col_data = self._data()
+                col_data[index] = new_data
+                self._commit(col_data)
+        return version
+
+
+    def update_doc(self,key_name,val,patch,expected_version=None):
+        """
+        Updates the first doc where key_name == val
+        :param key_name: Name of the key
+        :param val: Value
+        :param patch: {key : new value} merged into the doc , or a function doc -> new doc
+        :param expected_version: Version the doc must still have , else ConflictError is raised
+        :return: Version of the new doc
+        """
+        while True:
+            # Found and merged unlocked , rewrite_doc writes it only if the doc is still the one merged
+            found = self.search_by_key_val(key_name,val)
+            if found is None:
+                raise Exception(f"Error : No doc with `{key_name}` = {val!r} in `{self.collection_name}`")
+            index, doc = found
+            version = doc_version(doc)
+            if expected_version is not None and version != expected_version:
+                raise ConflictError(f"Error : Doc {index} of `{self.collection_name}` changed since version {expected_version}")
+            new_data = patch(dict(doc)) if callable(patch) else {**doc, **patch}
+            try:
+                return self.rewrite_doc(index,new_data,version)
+            except (ConflictError, IndexError):
+                # Changed (or removed) by another writer meanwhile , merge again
+                if expected_version is not None:
+                    raise ConflictError(f"Error : Doc {index} of `{self.collection_name}` changed since version {expected_version}")
+
+
+    def create_index(self,key,unique=False):
+        """
+        Makes a persisted key -> positions index used by search_by_key_val (flushes first in cache mode)
+        :param key: Key to index
+        :param unique: Reject docs with a value already in the index
+        :return: None
+        """
+        self.flush()
+        OsomeDB.create_index(self,self.collection_name,key,unique)
+
+
+    def drop_index(self,key):
+        """
+        Removes an index
+        :param key: Indexed key
+        :return: None
+        """
+        OsomeDB.drop_index(self,self.collection_name,key)
+
+
+    def compact(self):
+        """
+        Drops the dead records of a log collection (flushes first in cache mode)
+        :return: None
+        """
+        self.flush()
+        self.compact_collection(self.collection_name)
+        self._file_stat = self._file_state()
+
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Defers the writes made by this thread inside the block to one commit at its end.
+        The collection stays locked for writing meanwhile , if the block raises nothing is written
+        :return: Collection
+        """
+        if getattr(self._batch, "docs", None) is not None:
+            yield self
+            return
+        with self.collection_lock(self.collection_name).write():
+            self._batch.docs = list(self._data())
+            self._batch.dirty = False
+            try:
+                yield self
+                docs, dirty = self._batch.docs, self._batch.dirty
+            finally:
+                self._batch.docs = None
+                self._batch.dirty = False
+            if dirty:
+                self._commit(docs)
+                self.flush()
+
+
+    def _matcher(self,predicate_or_keys):
+        if callable(predicate_or_keys):
+            return predicate_or_keys
+        return lambda doc: all(key in doc and doc[key] == val for key, val in predicate_or_keys.items())
+
+
+    def insert_many(self,docs):
+        """
+        Adds docs with one load and one commit (log collections just append them)
+        :param docs: Docs
+        :return: None
+        """
+        docs = list(docs)
+        if self._deferred():
+            new_collection = self._data()
+            new_collection.extend(docs)
+            self._commit(new_collection)
+        else:
+            self.append_docs(self.collection_name,docs)
+
+
+    def update_many(self,predicate_or_keys,patch):
+        """
+        Updates every matching doc with one load and one commit
+        :param predicate_or_keys: A function doc -> True / False , or {key : value} to match
+        :param patch: {key : new value} merged into the docs , or a function doc -> new doc
+        :return: Number of docs updated
+        """
+        matches = self._matcher(predicate_or_keys)
+        with self.collection_lock(self.collection_name).write():
+            col_data = self._data()
+            changes = {}
+            for index, doc in enumerate(col_data):
+                if matches(doc):
+                    changes[index] = patch(dict(doc)) if callable(patch) else {**doc, **patch}
+            if not changes:
+                return 0
+            if self._deferred():
+                for index, doc in changes.items():
+                    col_data[index] = doc
+                self._commit(col_data)
+            else:
+                self.replace_docs(self.collection_name,changes)
+        return len(changes)
+
+
+    def delete_many(self,predicate_or_keys):
+        """
+        Removes every matching doc with one load and one commit
+        :param predicate_or_keys: A function doc -> True / False , or {key : value} to match
+        :return: Number of docs removed
+        """
+        matches = self._matcher(predicate_or_keys)
+        with self.collection_lock(self.collection_name).write():
+            col_data = self._data()
+            positions = [index for index, doc in enumerate(col_data) if matches(doc)]
+            if not positions:
+                return 0
+            if self._deferred():
+                removed = set(positions)
+                self._commit([doc for index, doc in enumerate(col_data) if index not in removed])
+            else:
+                self.delete_docs(self.collection_name,positions)
+        return len(positions)
+
+
+class AsyncOsomeDB:
+    def __init__(self,db,executor=None):
+        """
+        asyncio facade of an OsomeDB : every call runs on an executor , the event loop never blocks on
+        file I/O , key derivation or (de)compression.
+        Concurrent reads of the same thing share one decode (the docs they get are shared , copy before
+        changing them). Writes are shielded : cancelling the awaiter does not stop a write that started ,
+        and collection files are only ever replaced whole or appended to , so nothing is left half written
+        :param db: The OsomeDB (see AsyncOsomeDB.open)
+        :param executor: Executor (default : the loop's default executor)
+        """
+        self.db = db
+        self.executor = executor
+        self._reads = {}
+        self._generations = {}
+
+
+    @classmethod
+    async def open(cls,db_path,executor=None):
+        """
+        Opens (or makes) a DB without blocking the loop
+        :param db_path: Path to the DB
+        :param executor: Executor (default : the loop's default executor)
+        :return: AsyncOsomeDB
+        """
+        import asyncio
+        db = await asyncio.get_running_loop().run_in_executor(executor, OsomeDB.open, db_path)
+        return cls(db,executor)
+
+
+    def _run(self,fn,*args,**kwargs):
+        import asyncio
+        return asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+
+    async def _read(self,name,key,fn,*args,**kwargs):
+        """
+        Runs a read , or joins the same read already running (when nothing was written to name since it began)
+        :param name: Collection / PassBin the read is about
+        :param key: What is read (hashable)
+        :param fn: Function doing the read
+        :return: Result
+        """
+        read_key = (name, self._generations.get(name, 0)) + key
+        future = self._reads.get(read_key)
+        if future is None:
+            future = self._run(fn,*args,**kwargs)
+            self._reads[read_key] = future
+            future.add_done_callback(lambda done: self._reads.pop(read_key, None))
+        import asyncio
+        return await asyncio.shield(future)
+
+
+    async def _write(self,name,fn,*args,**kwargs):
+        """
+        Runs a write to the end even if the awaiter is cancelled , later reads of name do not join older ones
+        :param name: Collection / PassBin written (None : all of them)
+        :param fn: Function doing the write
+        :return: Result
+        """
+        future = self._run(fn,*args,**kwargs)
+        future.add_done_callback(lambda done: self._written(name))
+        import asyncio
+        return await asyncio.shield(future)
+
+
+    def _written(self,name):
+        for e in (self.db.collections if name is None else [name]):
+            self._generations[e] = self._generations.get(e, 0) + 1
+
+
+    def get_collection(self,collection,cache=False,flush_ops=None,flush_interval=None):
+        """
+        :param collection: The Name of the Collection
+        :param cache: See OsomeDB.get_collection
+        :return: AsyncCollection
+        """
+        return AsyncCollection(self,self.db.get_collection(collection,cache,flush_ops,flush_interval))
+
+
+    async def get_passbin(self,bin_name):
+        """
+        :param bin_name: Name of the passbin (made if it does not exist)
+        :return: AsyncPassBin
+        """
+        return AsyncPassBin(self,await self._write(bin_name,self.db.get_passbin,bin_name))
 
 
-        def passbin_exists(self,bin_name):
-            """
-            Shows if a PassBin exists
-            :param bin_name: Name of the passbin
-            :return: True / False
-            """
-            result = os.path.exists(f"{self.db_path}/{bin_name}")
-            return result
+    async def collection_exists(self,collection):
+        return await self._run(self.db.collection_exists,collection)
 
 
-        def make_new_passbin(self):
-            self.print_info(F"PASSBIN {self.bin_name} MADE")
-            self.oosome.make_collection(self.bin_name)
+    async def make_collection(self,collection,storage=None,codec=None,compression=None):
+        return await self._write(collection,self.db.make_collection,collection,storage,codec,compression)
 
 
-        def get_pass_bin(self):
-            """
-            :return: The passbin
-            """
-            try:
-                bin = self.oosome.load_collection(self.bin_name)
-                return bin
-            except:
-                raise Exception("Error While Reading PassBin")
+    async def remove_collection(self,collection):
+        return await self._write(collection,self.db.remove_collection,collection)
 
 
-        def write_pass_bin(self,data):
-            """
-            Rewrite the passbin
-            :param data: New PASSBIN DATA
-            :return: None
-            """
-            try:
-               self.oosome.write_collection(self.bin_name,data)
-            except:
-                raise Exception("Error While Writing PassBin")
+    async def load_collection(self,collection):
+        """
+        :param collection: Collection Name
+        :return: Collection Data
+        """
+        return list(await self._read(collection,("load",),self.db.load_collection,collection))
 
 
-        def __len__(self):
-            return len(self.get_pass_bin())
+    async def write_collection(self,collection,data):
+        return await self._write(collection,self.db.write_collection,collection,data)
 
 
-        def __str__(self):
-            return f"Name : {self.bin_name}"
+    async def total_docs(self,workers=None,pool=None):
+        return await self._run(self.db.total_docs,workers,pool)
 
 
-        def __repr__(self):
-            return f"Name : {self.bin_name} Len : {len(self.get_pass_bin())}"
+    async def find_all(self,filter=None,projection=None,collections=None,workers=None,pool=None):
+        return await self._run(self.db.find_all,filter,projection,collections,workers,pool)
 
 
-        def __add__(self, other):
-            new_collection = self.get_pass_bin()
-            new_collection.append(other)
-            return new_collection
+    async def export(self,dest,collections=None,workers=None,pool=None):
+        return await self._run(self.db.export,dest,collections,workers,pool)
 
 
-        def __sub__(self, other):
-            try:
-                new_collection = self.get_pass_bin()
-                new_collection.remove(other)
-                return new_collection
-            except:
-                raise Exception(f"Error : `{other}` Not found in the PassBin `{self.bin_name}`")
+    async def reencrypt(self,new_enc,workers=None,pool=None):
+        return await self._write(None,self.db.reencrypt,new_enc,workers,pool)
 
 
-        def __iadd__(self, other):
-            new_pass_bin = self.get_pass_bin()
-            new_pass_bin.append(other)
-            self.write_pass_bin(new_pass_bin)
-            return OsomeDB.PassBin(self.db_path, self.bin_name)
+    async def recompress(self,compression=None,collections=None,workers=None,pool=None):
+        return await self._write(None,self.db.recompress,compression,collections,workers,pool)
 
 
-        def __isub__(self, other):
-            try:
-                pass_bin  = self.get_pass_bin()
-                pass_bin.remove(other)
-                self.write_pass_bin(pass_bin)
-                return OsomeDB.PassBin(self.db_path, self.bin_name)
-            except:
-                raise Exception(f"Error : `{other}` Not found in the PassBin `{self.bin_name}`")
+    async def sync(self):
+        return await self._write(None,self.db.sync)
 
 
-        def __int__(self):
-            return len(self.get_pass_bin())
+class AsyncCollection:
+    def __init__(self,adb,collection):
+        """
+        asyncio facade of a Collection (see AsyncOsomeDB)
+        :param adb: The AsyncOsomeDB
+        :param collection: The Collection
+        """
+        self.adb = adb
+        self.collection = collection
+        self.collection_name = collection.collection_name
 
 
-        def delete_bin(self):
-            """
-            Deletes the PassBin
-            :return: None
-            """
-            self.oosome.delete_collection(self.bin_name)
-            self.print_info(F"PASSBIN {self.bin_name} DELETED")
+    def _read(self,key,fn,*args,**kwargs):
+        return self.adb._read(self.collection_name,key,fn,*args,**kwargs)
 
 
-        def __bool__(self):
-            return True
+    def _write(self,fn,*args,**kwargs):
+        return self.adb._write(self.collection_name,fn,*args,**kwargs)
 
 
-        def get_passbin_size(self,bin_name):
-            """
-            Give the size of the passbin
-            :param bin_name: PassBin Name
-            :return: Size
-            """
-            try:
-                past = os.getcwd()
-                try:
-                    os.chdir(self.db_path)
-                except:
-                    pass
-                size = os.path.getsize(bin_name)
-                try:
-                    os.chdir(past)
-                except:
-                    pass
-            except:
-                raise Exception("Error : Error While Getting The PassBin's Size")
-            return size
+    async def load(self):
+        """
+        :return: Collection Data
+        """
+        return list(await self._read(("load",),self.collection.read_collection_data))
 
 
-        def __sizeof__(self):
-            return self.get_passbin_size(self.bin_name)
+    async def count(self,filter=None):
+        return await self._read(("count", json.dumps(filter, sort_keys=True, default=str)),self.collection.count,filter)
 
 
-        def append_new_pass(self, Id, Password):
-            """
-            Appends New Password
-            :param Id: Id of the Password
-            :param Password: Password
-            :return: None
-            """
-            col_data = self.get_pass_bin()
-            col_data.append({"Id":Id,"Password":self.custom_hash(Password)})
-            self.write_pass_bin(col_data)
+    async def find(self,filter=None,projection=None,sort=None,limit=None):
+        """
+        See Collection.find
+        :return: Docs
+        """
+        key = ("find", json.dumps([filter, projection, sort, limit], sort_keys=True, default=str))
+        return list(await self._read(key,self.collection.find,filter,projection,sort,limit))
 
 
-        def remove(self,Id):
-            """
-            Removes a password form PassBin which have the provided Id
-            :param Id: Id of the Password
-            :return: None
-            """
-            try:
-                pass_bin = self.get_pass_bin()
-                pass_bin.remove(self.search_by_Id(Id[1]))
-                self.write_pass_bin(pass_bin)
-            except:
-                raise Exception(f"Error : `{Id}` Not found in the PassBin `{self.bin_name}`")
+    async def find_one(self,filter=None,projection=None,sort=None):
+        found = await self.find(filter,projection,sort,limit=1)
+        return found[0] if found else None
 
 
-        def reset_pass(self, Id, Password):
-            """
-            Reset a Password By Given Id
-            :param Id: Id of the Password
-            :param Password: New Password
-            :return: None
-            """
-            col_data = self.get_pass_bin()
-            elem = self.search_by_Id(Id)
-            col_data[elem[0]] = {"Id":Id,"Password":self.custom_hash(Password)}
-            self.write_pass_bin(col_data)
+    async def explain(self,filter=None):
+        return await self.adb._run(self.collection.explain,filter)
 
 
-        def custom_hash(self,data):
-            result = hashlib.sha256(data.encode())
-            result = result.hexdigest()
-            return result
+    async def get_byindex(self,index):
+        return await self._read(("index", index),self.collection.get_byindex,index)
 
 
-        def search_by_Id(self,Id):
-            """
-            Search a Password By Id
-            :param Id: Id of the password
-            :return: Index , Item
-            """
-            col_data = self.get_pass_bin()
-            for e in col_data:
-                if e["Id"] == Id:
-                    return (col_data.index(e), e)
+    async def search_by_key_val(self,key_name,val):
+        key = ("search", key_name, json.dumps(val, sort_keys=True, default=str))
+        return await self._read(key,self.collection.search_by_key_val,key_name,val)
 
 
-    class Settings:
-        def __init__(self,db_path):
-            """
-            :param db_path: The path to the DB
-            """
-            self.db_path = db_path
+    async def insert(self,doc):
+        """
+        Adds a doc (same as collection += doc)
+        :param doc: Doc
+        :return: None
+        """
+        return await self._write(self.collection.insert_many,[doc])
 
 
-        def change(self,key,value):
-            """
-            Change The VALUE of a key in config.json
-            :param key: Key
-            :param value: New Value
-            :return: None
-            """
-            settings = self.get_settings()
-            settings[key]=value
-            self.write_settings(settings)
+    async def insert_many(self,docs):
+        return await self._write(self.collection.insert_many,list(docs))
 
 
-        def give_setting_info(self):
-            """
-            Gives Info about what all setting are available
-            :return: Info
-            """
-            info = """
-    Config File (json) :
-    - > DB_NAME
-    - > Date Created
-    - > List of collections
-    - > enc
-    - > compression
-            """
-            return info
+    async def remove(self,doc):
+        """
+        Removes a doc (same as collection -= doc)
+        :param doc: Doc
+        :return: None
+        """
+        await self._write(self.collection.__isub__,doc)
 
 
-        def get(self,key):
-            """
-            Get the value of a Key
-            :param key: Key
-            :return: Value
-            """
-            return self.get_settings()[key]
+    async def get_versioned(self,index):
+        return await self._read(("versioned", index),self.collection.get_versioned,index)
 
 
-        def get_settings(self):
-            """
-            Loads the settings
-            :return: Settings
-            """
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            config_fle = open("config.json", "r")
-            data = config_fle.read()
-            config_fle.close()
-            try:
-                os.chdir(past)
-            except:
-                pass
-            return json.loads(data)
+    async def rewrite_doc(self,index,new_data,expected_version=None):
+        return await self._write(self.collection.rewrite_doc,index,new_data,expected_version)
 
 
-        def write_settings(self, settings):
-            """
-            Rewrites the settings
-            :param settings: New Settings
-            :return: None
-            """
-            past = os.getcwd()
-            try:
-                os.chdir(self.db_path)
-            except:
-                pass
-            config_fle = open("config.json", "w")
-            config_fle.write(json.dumps(settings))
-            config_fle.close()
-            try:
-                os.chdir(past)
-            except:
-                pass
+    async def update_doc(self,key_name,val,patch,expected_version=None):
+        return await self._write(self.collection.update_doc,key_name,val,patch,expected_version)
 
 
-class Collection(OsomeDB):
-    def __init__(self,db_path,collection):
+    async def rewrite(self,data):
         """
-        :param db_path: Path to the DB
-        :param collection: Name of the Collection
+        Rewrites the Collection
+        :param data: New Data
+        :return: None
         """
-        super().__init__(db_path)
-        self.collection_name = collection
+        return await self._write(self.collection.rewrite_collection_data,data)
 
 
-    def __len__(self):
-        return len(self.load_collection(self.collection_name))
+    async def update_many(self,predicate_or_keys,patch):
+        return await self._write(self.collection.update_many,predicate_or_keys,patch)
 
 
-    def __str__(self):
-        return f"Name : {self.collection_name}"
+    async def delete_many(self,predicate_or_keys):
+        return await self._write(self.collection.delete_many,predicate_or_keys)
 
 
-    def __repr__(self):
-        return f"Name : {self.collection_name} Len : {len(self.load_collection(self.collection_name))}"
+    async def create_index(self,key,unique=False):
+        return await self._write(self.collection.create_index,key,unique)
 
 
-    def __add__(self, other):
-        new_collection = self.read_collection_data()
-        new_collection.append(other)
-        return new_collection
+    async def drop_index(self,key):
+        return await self._write(self.collection.drop_index,key)
 
 
-    def __sub__(self, other):
-        try:
-            new_collection = self.read_collection_data()
-            new_collection.remove(other)
-            return new_collection
-        except:
-            raise Exception(f"Error : `{other}` Not found in the Collection `{self.collection_name}`")
+    async def compact(self):
+        return await self._write(self.collection.compact)
 
 
-    def __iadd__(self, other):
-        new_collection = self.read_collection_data()
-        new_collection.append(other)
-        self.rewrite_collection_data(new_collection)
-        return Collection(self.db_path,self.collection_name)
+    async def flush(self):
+        return await self._write(self.collection.flush)
 
 
-    def __isub__(self, other):
-        try:
-            new_collection = self.read_collection_data()
-            new_collection.remove(other)
-            self.rewrite_collection_data(new_collection)
-            return Collection(self.db_path,self.collection_name)
-        except:
-            raise Exception(f"Error : `{other}` Not found in the Collection `{self.collection_name}`")
+    async def delete(self):
+        return await self._write(self.collection.delete)
 
 
-    def __int__(self):
-        return len(self.load_collection(self.collection_name))
+class AsyncPassBin:
+    def __init__(self,adb,pass_bin):
+        """
+        asyncio facade of a PassBin (see AsyncOsomeDB)
+        :param adb: The AsyncOsomeDB
+        :param pass_bin: The PassBin
+        """
+        self.adb = adb
+        self.pass_bin = pass_bin
+        self.bin_name = pass_bin.bin_name
 
 
-    def delete(self):
-        self.delete_collection(self.collection_name)
+    def _read(self,key,fn,*args,**kwargs):
+        return self.adb._read(self.bin_name,key,fn,*args,**kwargs)
 
 
-    def __bool__(self):
-        return True
+    def _write(self,fn,*args,**kwargs):
+        return self.adb._write(self.bin_name,fn,*args,**kwargs)
 
 
-    def __sizeof__(self):
-        return self.get_collection_size(self.collection_name)
+    async def get_pass_bin(self):
+        return list(await self._read(("load",),self.pass_bin.get_pass_bin))
 
 
-    def read_collection_data(self):
-        """
-        Gives the collection data
-        :return: Collection Data
-        """
-        return self.load_collection(self.collection_name)
+    async def search_by_Id(self,Id):
+        return await self._read(("search", json.dumps(Id, default=str)),self.pass_bin.search_by_Id,Id)
 
 
-    def rewrite_collection_data(self,data):
+    async def verify(self,Id,Password):
         """
-        Rewrites the Collection
-        :param data: New Data
-        :return: None
+        Checks a password (each call runs its own KDF , they are not shared)
+        :param Id: Id of the Password
+        :param Password: Password
+        :return: True / False
         """
-        self.write_collection(self.collection_name,data)
+        return await self.adb._run(self.pass_bin.verify,Id,Password)
 
 
-    def get_indexof(self,data):
-        """
-        Get The index of a given doc
-        :param data: Doc's data
-        :return: Index
-        """
-        return self.read_collection_data().index(data)
+    async def append_new_pass(self,Id,Password):
+        return await self._write(self.pass_bin.append_new_pass,Id,Password)
 
 
-    def get_byindex(self,index):
-        """
-        Gets a Doc By Index
-        :param index: Index
-        :return: Doc
-        """
-        return self.read_collection_data()[index]
+    async def append_many_pass(self,pairs):
+        return await self._write(self.pass_bin.append_many_pass,pairs)
 
 
-    def search_by_key_val(self,key_name,val):
-        """
-        Search using the value of a given key
-        :param key_name: Name of the key
-        :param val: Value
-        :return: Index , Doc
-        """
-        col_data = self.read_collection_data()
-        for e in col_data:
-            if e[key_name] == val:
-                return (col_data.index(e),e)
+    async def remove(self,Id):
+        return await self._write(self.pass_bin.remove,Id)
 
 
-    def rewrite_doc(self,index,new_data):
-        """
-        Rewrites a doc with given Index
-        :param index: Index
-        :param new_data: New Doc Data
-        :return: None
-        """
-        col_data = self.read_collection_data()
-        col_data[index] = new_data
-        self.rewrite_collection_data(col_data)
+    async def reset_pass(self,Id,Password):
+        return await self._write(self.pass_bin.reset_pass,Id,Password)
+
 
+    async def delete_bin(self):
+        return await self._write(self.pass_bin.delete_bin)
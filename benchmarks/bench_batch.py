@@ -0,0 +1,56 @@
+"""
+Benchmark : inserting docs one by one (+=) vs in one batch (insert_many),
+for blob and log collections.
+
+    python benchmarks/bench_batch.py [sizes] [per-doc max]
+
+    sizes : comma separated doc counts (default 1000,10000,100000)
+    per-doc max : biggest size measured with += on blob collections , every
+                  += rewrites the whole collection so it grows as N^2 (default 10000)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import docs_for, timed
+from OSOME_DB import OsomeDB
+
+
+def per_doc(collection, docs):
+    for doc in docs:
+        collection += doc
+
+
+def main():
+    sizes = [int(e) for e in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    per_doc_max = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "Batch"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        print(f"{'storage':<8}{'docs':>8}{'per-doc docs/s':>18}{'batched docs/s':>18}")
+        for storage in ("blob", "log"):
+            for count in sizes:
+                docs = docs_for(count)
+                rates = []
+                for mode in ("per-doc", "batched"):
+                    name = f"{storage}-{mode}-{count}"
+                    db.make_collection(name, storage=storage)
+                    collection = db.get_collection(name)
+                    if mode == "per-doc" and storage == "blob" and count > per_doc_max:
+                        rates.append("skipped")
+                    elif mode == "per-doc":
+                        rates.append(f"{count / timed(lambda: per_doc(collection, docs)):.1f}")
+                    else:
+                        rates.append(f"{count / timed(lambda: collection.insert_many(docs)):.1f}")
+                    db.remove_collection(name)
+                print(f"{storage:<8}{count:>8}{rates[0]:>18}{rates[1]:>18}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
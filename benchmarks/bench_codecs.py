@@ -0,0 +1,46 @@
+"""
+Benchmark : encode / decode time and on-disk size of a blob collection per
+codec (msgpack is skipped when it is not installed).
+
+    python benchmarks/bench_codecs.py [docs] [rounds]
+
+    docs : docs in the collection (default 100000)
+    rounds : writes and loads timed per codec , the best one is kept (default 3)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import docs_for, best
+from OSOME_DB import OsomeDB, CODECS
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    docs = docs_for(count, marks=True, active=True)
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "Codecs"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        print(f"{count} docs")
+        print(f"{'codec':<10}{'write s':>10}{'load s':>10}{'size KiB':>12}")
+        for codec in CODECS:
+            try:
+                db.make_collection(codec, codec=codec)
+                write = best(lambda: db.write_collection(codec, docs), rounds)
+            except Exception as e:
+                print(f"{codec:<10}  skipped : {e}")
+                continue
+            load = best(lambda: db.load_collection(codec), rounds)
+            size = os.path.getsize(db.collection_path(codec)) / 1024
+            print(f"{codec:<10}{write:>10.3f}{load:>10.3f}{size:>12.1f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark : compression ratio vs write / load throughput of a blob collection
+per compression setting , plain and encrypted.
+
+    python benchmarks/bench_compression.py [docs] [rounds]
+
+    docs : docs in the collection (default 100000)
+    rounds : writes and loads timed per setting , the best one is kept (default 3)
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import docs_for, best
+from OSOME_DB import OsomeDB
+
+SETTINGS = ("none", "zlib:1", "zlib:6", "zlib:9", "lzma:1", "lzma", "bz2")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    docs = docs_for(count, marks=True)
+    raw_size = len(json.dumps(docs, separators=(",", ":")))
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "Compression"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        print(f"{count} docs , {raw_size / 2 ** 20:.1f} MiB of JSON")
+        print(f"{'setting':<10}{'enc':>6}{'ratio':>8}{'write MiB/s':>14}{'load MiB/s':>13}")
+        for enc in (False, "Bench-Password"):
+            db.Settings(db.db_path).change("ENC", enc)
+            for setting in SETTINGS:
+                name = f"{setting.replace(':', '-')}-{bool(enc)}"
+                db.make_collection(name, compression=setting)
+                write = best(lambda: db.write_collection(name, docs), rounds)
+                load = best(lambda: db.load_collection(name), rounds)
+                ratio = raw_size / os.path.getsize(db.collection_path(name))
+                mib = raw_size / 2 ** 20
+                print(f"{setting:<10}{'on' if enc else 'off':>6}{ratio:>8.2f}{mib / write:>14.1f}{mib / load:>13.1f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
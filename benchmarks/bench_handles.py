@@ -0,0 +1,42 @@
+"""
+Benchmark : cost of getting a Collection / PassBin handle.
+
+    python benchmarks/bench_handles.py [collections] [seconds]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import ops_per_sec
+from OSOME_DB import OsomeDB, Collection
+
+
+def main():
+    collections = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "Handles")
+    try:
+        db = OsomeDB(path)
+        for i in range(collections):
+            db.make_collection(f"Collection-{i}")
+        db.get_passbin("Passwords")
+        rows = [
+            ("OsomeDB(path) + get_collection (full open)", ops_per_sec(lambda: OsomeDB(path).get_collection("Collection-0"), seconds)),
+            ("Collection(path , name)", ops_per_sec(lambda: Collection(path, "Collection-0"), seconds)),
+            ("db.get_collection(name)", ops_per_sec(lambda: db.get_collection("Collection-0"), seconds)),
+            ("db.PassBin(path , name)", ops_per_sec(lambda: db.PassBin(path, "Passwords"), seconds)),
+            ("db.get_passbin(name)", ops_per_sec(lambda: db.get_passbin("Passwords"), seconds)),
+        ]
+        print(f"handle construction , {collections} collections in the DB")
+        for name, rate in rows:
+            print(f"  {name:<44} {rate:>12.1f} ops/sec")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark : ops/sec of encrypted vs plaintext collections,
+with the derived-key cache (after) and without it (before).
+
+    python benchmarks/bench_key_cache.py [docs] [seconds]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import ops_per_sec
+import OSOME_DB
+from OSOME_DB import OsomeDB
+
+
+def make_db(path, password, docs):
+    db = OsomeDB(path)
+    if password:
+        db.Settings(path).change("ENC", password)
+    db.make_collection("Students")
+    col = OsomeDB(path).get_collection("Students")
+    col.rewrite_collection_data([{"ID": str(i), "Name": f"Student-{i}"} for i in range(docs)])
+    return col
+
+
+def main():
+    docs = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+    tmp = tempfile.mkdtemp()
+    try:
+        plain = make_db(os.path.join(tmp, "Plain"), False, docs)
+        enc = make_db(os.path.join(tmp, "Enc"), "bench-password", docs)
+        target = str(docs - 1)
+        rows = [
+            ("plaintext", ops_per_sec(lambda: plain.search_by_key_val("ID", target), seconds)),
+            ("encrypted (before , no key cache)", ops_per_sec(lambda: enc.search_by_key_val("ID", target), seconds, OSOME_DB.clear_key_cache)),
+            ("encrypted (after , key cache)", ops_per_sec(lambda: enc.search_by_key_val("ID", target), seconds)),
+        ]
+        print(f"search_by_key_val , {docs} docs")
+        for name, rate in rows:
+            print(f"  {name:<36} {rate:>10.1f} ops/sec")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark : cost of the metrics on loads and single doc writes , off vs on ,
+for plain and encrypted blob and log collections.
+
+    python benchmarks/bench_metrics.py [docs] [rounds]
+
+    docs : docs in the collection (default 10000)
+    rounds : loads / writes timed per setting , the best run is kept (default 20)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import docs_for, best
+from OSOME_DB import OsomeDB
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "Metrics"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        print(f"{'storage':<8}{'enc':>5}{'metrics':>9}{'load ms':>10}{'write ms':>10}")
+        for enc in (False, "Bench-Password"):
+            db.Settings(db.db_path).change("ENC", enc)
+            for storage in ("blob", "log"):
+                name = f"{storage}-{bool(enc)}"
+                db.make_collection(name, storage=storage)
+                collection = db.get_collection(name)
+                collection.insert_many(docs_for(count))
+                for metrics in (False, True):
+                    if metrics:
+                        db.enable_metrics()
+                    load = best(lambda: db.load_collection(name), rounds)
+                    write = best(lambda: collection.rewrite_doc(0, {"ID": "0"}), rounds)
+                    db.disable_metrics()
+                    print(f"{storage:<8}{'on' if enc else 'off':>5}{'on' if metrics else 'off':>9}"
+                          f"{load * 1000:>10.2f}{write * 1000:>10.2f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
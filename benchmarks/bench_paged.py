@@ -0,0 +1,54 @@
+"""
+Benchmark : point reads (get_byindex) and updates (rewrite_doc) on blob , log ,
+paged and mmap collections.
+
+    python benchmarks/bench_paged.py [sizes] [ops]
+
+    sizes : comma separated doc counts (default 1000,10000,100000)
+    ops : reads and updates timed per collection (default 200)
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import docs_for
+from OSOME_DB import OsomeDB
+
+
+def rate(fn, positions):
+    start = time.perf_counter()
+    for index in positions:
+        fn(index)
+    return f"{len(positions) / (time.perf_counter() - start):.1f}"
+
+
+def main():
+    sizes = [int(e) for e in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "Paged"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        print(f"{'storage':<8}{'docs':>8}{'reads/s':>14}{'updates/s':>14}")
+        for storage in ("blob", "log", "paged", "mmap"):
+            for count in sizes:
+                name = f"{storage}-{count}"
+                db.make_collection(name, storage=storage)
+                collection = db.get_collection(name)
+                collection.insert_many(docs_for(count))
+                positions = [random.randrange(count) for i in range(ops)]
+                reads = rate(collection.get_byindex, positions)
+                updates = rate(lambda index: collection.rewrite_doc(index, {"ID": str(index)}), positions)
+                db.remove_collection(name)
+                print(f"{storage:<8}{count:>8}{reads:>14}{updates:>14}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark : DB wide find_all and recompress on an encrypted DB with many
+collections , with 1 to N workers on process and thread pools.
+
+    python benchmarks/bench_parallel.py [collections] [docs] [max workers]
+
+    collections : number of collections (default 32)
+    docs : docs per collection (default 5000)
+    max workers : biggest pool measured (default : the number of CPUs)
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import docs_for, timed
+from OSOME_DB import OsomeDB
+
+
+def main():
+    collections = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    max_workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count() or 1
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "Parallel"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        db.Settings(db.db_path).change("ENC", "Bench-Password")
+        storages = ("blob", "log", "paged")
+        for index in range(collections):
+            name = f"C{index}"
+            db.make_collection(name, storage=storages[index % len(storages)])
+            db.get_collection(name).insert_many(docs_for(count))
+        workers = sorted({1, 2, 4, max_workers} - {e for e in (2, 4) if e > max_workers})
+        print(f"{collections} collections x {count} docs , {os.cpu_count()} CPUs")
+        print(f"{'pool':<8}{'workers':>8}{'find_all s':>14}{'recompress s':>14}")
+        for pool in ("process", "thread"):
+            for size in workers:
+                find = timed(lambda: db.find_all({"Class": 3}, workers=size, pool=pool))
+                recompress = timed(lambda: db.recompress(workers=size, pool=pool))
+                print(f"{pool:<8}{size:>8}{find:>14.3f}{recompress:>14.3f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark : PassBin.verify per second for a few KDF costs , and the Id lookup
+behind it (the in-memory bin vs search_by_Id through the Id index , which
+decodes only the indexed doc).
+
+    python benchmarks/bench_passbin.py [passwords] [iterations] [seconds]
+
+    passwords : passwords in the bin (default 10000)
+    iterations : comma separated KDF costs (default 1000,10000,100000)
+    seconds : time spent per measure (default 2)
+"""
+
+import os
+import sys
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import ops_per_sec
+from OSOME_DB import OsomeDB
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    costs = [int(e) for e in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1000, 10000, 100000]
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 2
+    tmp = tempfile.mkdtemp()
+    try:
+        db = OsomeDB(os.path.join(tmp, "PassBin"))
+        db.Settings(db.db_path).change("FSYNC", "never")
+        print(f"{count} passwords")
+        print(f"{'iterations':<12}{'verify/s':>12}")
+        for iterations in costs:
+            db.Settings(db.db_path).change("PASS_ITERATIONS", iterations)
+            pass_bin = db.get_passbin(f"Bin-{iterations}")
+            # Same salt and hash for every entry , only the lookups differ
+            stored = pass_bin.custom_hash("Password")
+            pass_bin.write_pass_bin([{"Id": str(i), "Password": stored} for i in range(count)])
+            ids = [str(random.randrange(count)) for i in range(1000)]
+            verify = ops_per_sec(lambda: pass_bin.verify(random.choice(ids), "Password"), seconds)
+            print(f"{iterations:<12}{verify:>12.1f}")
+        cached = ops_per_sec(lambda: pass_bin._records().get(random.choice(ids)), seconds)
+        pass_bin._cache = None
+        indexed = ops_per_sec(lambda: pass_bin.search_by_Id(random.choice(ids)), seconds)
+        print(f"Id lookups/s : in memory {cached:.1f} , search_by_Id (indexed doc) {indexed:.1f}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark : cold start in fresh processes : importing OSOME_DB , then opening a
+DB and running a first query , on a plain and an encrypted DB. Also lists the
+heavy modules each step loaded.
+
+    python benchmarks/bench_startup.py [runs] [max import ms]
+
+    runs : fresh processes per step , the median is kept (default 10)
+    max import ms : exit 1 if the median import takes longer (default : no check)
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from common import docs_for
+
+HEAVY = ("cryptography", "asyncio", "concurrent.futures", "pickle", "secrets", "lzma", "bz2", "sty")
+
+# Run in a fresh interpreter , prints {"import_ms" , "query_ms" , "modules"}
+CHILD = """
+import sys , time , json
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from OSOME_DB import OsomeDB
+imported = time.perf_counter()
+db_path = {db_path!r}
+if db_path:
+    OsomeDB(db_path).get_collection("Students").find_one({{"Class": 5}})
+done = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "query_ms": (done - imported) * 1000,
+                  "modules": [e for e in {heavy!r} if e in sys.modules]}}))
+"""
+
+
+def run_child(db_path):
+    code = CHILD.format(root=ROOT, db_path=db_path, heavy=HEAVY)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    max_import = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    from OSOME_DB import OsomeDB
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = {"import only": ""}
+        for enc in (False, "Bench-Password"):
+            path = os.path.join(tmp, f"Startup-{bool(enc)}")
+            db = OsomeDB(path)
+            db.Settings(db.db_path).change("ENC", enc)
+            db.make_collection("Students")
+            db.get_collection("Students").insert_many(docs_for(1000))
+            paths["open + find_one " + ("(ENC)" if enc else "(plain)")] = path
+        # The first child also writes the bytecode cache , keep it out of the numbers
+        run_child("")
+        print(f"{'step':<26}{'import ms':>11}{'query ms':>10}  modules loaded")
+        medians = {}
+        for name, path in paths.items():
+            results = [run_child(path) for i in range(runs)]
+            medians[name] = statistics.median(e["import_ms"] for e in results)
+            query = statistics.median(e["query_ms"] for e in results)
+            print(f"{name:<26}{medians[name]:>11.1f}{query:>10.1f}  {', '.join(results[-1]['modules']) or '-'}")
+    finally:
+        shutil.rmtree(tmp)
+    if max_import is not None and medians["import only"] > max_import:
+        print(f"Import took {medians['import only']:.1f} ms , over {max_import} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Helpers shared by the benchmarks : synthetic docs and timers.
+"""
+
+import time
+
+
+def docs_for(count, marks=False, active=False):
+    """
+    Synthetic student docs
+    :param count: Number of docs
+    :param marks: Add a "Marks" list (int and float)
+    :param active: Add an "Active" bool
+    :return: Docs
+    """
+    docs = []
+    for i in range(count):
+        doc = {"ID": str(i), "Name": f"Student-{i}", "Class": i % 12}
+        if marks:
+            doc["Marks"] = [i % 100, 50.5]
+        if active:
+            doc["Active"] = i % 2 == 0
+        docs.append(doc)
+    return docs
+
+
+def timed(fn):
+    """
+    :return: Seconds one call of fn took
+    """
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def best(fn, rounds):
+    """
+    :return: Seconds of the fastest of rounds calls of fn
+    """
+    return min(timed(fn) for i in range(rounds))
+
+
+def ops_per_sec(fn, seconds, before_each=None):
+    """
+    Calls fn again and again for some seconds
+    :param before_each: Called before each call , counted in the time
+    :return: Calls per second
+    """
+    ops = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if before_each is not None:
+            before_each()
+        fn()
+        ops += 1
+    return ops / (time.perf_counter() - start)
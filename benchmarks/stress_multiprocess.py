@@ -0,0 +1,80 @@
+"""
+Stress test : many processes append to the same blob , log , paged and mmap
+collections at once (half of them forked after the parent opened the DB) ,
+then checks that no write was lost and that every collection's generation
+counted every commit.
+
+    python benchmarks/stress_multiprocess.py [processes] [writes]
+
+    processes : writing processes per collection (default 8)
+    writes : docs each process appends , one commit per doc (default 50)
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from OSOME_DB import OsomeDB
+
+STORAGES = ("blob", "log", "paged", "mmap")
+
+
+def writer(db_path, collection, worker, writes, db=None):
+    if db is None:
+        db = OsomeDB(db_path)
+    for i in range(writes):
+        db.append_docs(collection, [{"Worker": worker, "Write": i}])
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    tmp = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(tmp, "Stress")
+        db = OsomeDB(db_path)
+        db.Settings(db.db_path).change("FSYNC", "never")
+        for storage in STORAGES:
+            db.make_collection(storage, storage=storage)
+        spawn = multiprocessing.get_context("spawn")
+        fork = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else spawn
+        jobs = []
+        for storage in STORAGES:
+            for worker in range(processes):
+                if worker % 2:
+                    # Forked from a process holding an open DB
+                    jobs.append(fork.Process(target=writer, args=(db_path, storage, worker, writes, db)))
+                else:
+                    jobs.append(spawn.Process(target=writer, args=(db_path, storage, worker, writes)))
+        start = time.perf_counter()
+        for job in jobs:
+            job.start()
+        for job in jobs:
+            job.join()
+        elapsed = time.perf_counter() - start
+        failed = [job.exitcode for job in jobs if job.exitcode]
+        print(f"{len(jobs)} processes x {writes} writes in {elapsed:.2f} s")
+        print(f"{'storage':<8}{'docs':>8}{'expected':>10}{'generation':>12}{'lost':>6}")
+        ok = not failed
+        for storage in STORAGES:
+            docs = db.load_collection(storage)
+            seen = {(doc["Worker"], doc["Write"]) for doc in docs}
+            expected = {(worker, i) for worker in range(processes) for i in range(writes)}
+            lost = len(expected - seen)
+            generation = db.generation(storage)
+            ok = ok and not lost and len(docs) == len(expected) and generation >= len(expected)
+            print(f"{storage:<8}{len(docs):>8}{len(expected):>10}{generation:>12}{lost:>6}")
+        if failed:
+            print(f"{len(failed)} processes failed")
+        print("OK" if ok else "FAILED")
+        sys.exit(0 if ok else 1)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark suite : every Collection and PassBin hot path on synthetic DBs ,
+plain and encrypted. Each case reports throughput , p50 / p99 latency and the
+peak RSS of the run so far , written as JSON so runs can be compared.
+
+    python benchmarks/suite.py [options]
+    python benchmarks/suite.py --out base.json
+    python benchmarks/suite.py --compare base.json               # run , then flag regressions against base.json
+    python benchmarks/suite.py --compare base.json --current new.json   # compare two saved runs
+
+    --docs : docs per collection (default 2000)
+    --width : extra keys per doc (default 8)
+    --collections : collections in the DB (default 4)
+    --ops : calls timed per case (default 200)
+    --modes : "plain" , "enc" or both (default plain,enc)
+    --storage : storage of the collections (default blob)
+    --pass-iterations : PBKDF2 cost of the PassBin (default 1000)
+    --threshold : slowdown (throughput or p99) flagged as a regression (default 0.2 = 20 %)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from OSOME_DB import OsomeDB, Collection
+
+
+def peak_rss_kib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS , KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(fn, args):
+    """
+    Calls fn once per item of args
+    :return: {"ops" , "ops_per_sec" , "p50_us" , "p99_us" , "peak_rss_kib"}
+    """
+    times = []
+    for arg in args:
+        start = time.perf_counter_ns()
+        fn(arg)
+        times.append(time.perf_counter_ns() - start)
+    total = sum(times)
+    times.sort()
+    return {"ops": len(times),
+            "ops_per_sec": round(len(times) / (total / 1e9), 1) if total else None,
+            "p50_us": round(percentile(times, 0.50) / 1e3, 1),
+            "p99_us": round(percentile(times, 0.99) / 1e3, 1),
+            "peak_rss_kib": peak_rss_kib()}
+
+
+def make_doc(index, width):
+    doc = {"ID": str(index), "Name": f"Student-{index}"}
+    for key in range(width):
+        doc[f"Field-{key}"] = (index * 31 + key) % 1000
+    return doc
+
+
+def run_mode(tmp, mode, args):
+    path = os.path.join(tmp, mode)
+    db = OsomeDB(path)
+    db.Settings(db.db_path).change("FSYNC", "never")
+    db.Settings(db.db_path).change("PASS_ITERATIONS", args.pass_iterations)
+    if mode == "enc":
+        db.Settings(db.db_path).change("ENC", "Suite-Password")
+    for index in range(args.collections):
+        db.make_collection(f"Collection-{index}", storage=args.storage)
+        db.write_collection(f"Collection-{index}", [make_doc(i, args.width) for i in range(args.docs)])
+    pass_bin = db.get_passbin("Passwords")
+    pass_bin.append_many_pass([(str(i), f"pass-{i}") for i in range(args.docs)])
+    collection = db.get_collection("Collection-0")
+    rng = random.Random(0)
+    positions = [rng.randrange(args.docs) for i in range(args.ops)]
+    new_docs = [make_doc(args.docs + i, args.width) for i in range(args.ops)]
+    ids = [str(e) for e in positions]
+    names = [f"Collection-{i % args.collections}" for i in range(args.ops)]
+    results = {}
+
+    def insert(doc):
+        nonlocal collection
+        collection += doc
+
+    def remove(doc):
+        nonlocal collection
+        collection -= doc
+
+    results["insert"] = measure(insert, new_docs)
+    results["get_byindex"] = measure(collection.get_byindex, positions)
+    results["search_by_key_val"] = measure(lambda Id: collection.search_by_key_val("ID", Id), ids)
+    results["rewrite_doc"] = measure(lambda index: collection.rewrite_doc(index, make_doc(index, args.width)), positions)
+    results["remove"] = measure(remove, new_docs)
+    results["total_docs"] = measure(lambda e: db.total_docs(), range(args.ops))
+    results["passbin_append"] = measure(lambda Id: pass_bin.append_new_pass(f"new-{Id}", "pass"), range(args.ops))
+    results["passbin_reset"] = measure(lambda Id: pass_bin.reset_pass(Id, f"pass-{Id}"), ids)
+    results["passbin_search"] = measure(pass_bin.search_by_Id, ids)
+    results["passbin_verify"] = measure(lambda Id: pass_bin.verify(Id, f"pass-{Id}"), ids)
+    # get_collection / get_passbin only look up a memoized handle , time real opens instead
+    results["handle_open_collection"] = measure(lambda name: OsomeDB(path).get_collection(name), names)
+    results["handle_collection"] = measure(lambda name: Collection(path, name), names)
+    results["handle_passbin"] = measure(lambda e: OsomeDB.PassBin(path, "Passwords", db=db), range(args.ops))
+    return results
+
+
+def compare(baseline, current, threshold):
+    """
+    Prints every case of both runs and flags the slower ones
+    :return: Regressions ["mode/case" ...]
+    """
+    regressions = []
+    print(f"{'case':<32}{'base ops/s':>12}{'ops/s':>12}{'base p99':>11}{'p99':>11}")
+    for key, new in current["results"].items():
+        old = baseline["results"].get(key)
+        if old is None:
+            continue
+        slower = bool(old["ops_per_sec"] and new["ops_per_sec"] and new["ops_per_sec"] < old["ops_per_sec"] * (1 - threshold))
+        slower = slower or new["p99_us"] > old["p99_us"] * (1 + threshold)
+        if slower:
+            regressions.append(key)
+        print(f"{key:<32}{old['ops_per_sec']:>12}{new['ops_per_sec']:>12}{old['p99_us']:>11}{new['p99_us']:>11}"
+              f"{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OsomeDB benchmark suite")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--collections", type=int, default=4)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--modes", default="plain,enc")
+    parser.add_argument("--storage", default="blob")
+    parser.add_argument("--pass-iterations", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--out", help="file the JSON results are written to (default : stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare with")
+    parser.add_argument("--current", help="saved JSON to compare instead of running the suite")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as current_file:
+            run = json.load(current_file)
+    else:
+        run = {"params": {key: getattr(args, key) for key in ("docs", "width", "collections", "ops", "modes", "storage", "pass_iterations")},
+               "python": platform.python_version(), "platform": platform.platform(),
+               "cpus": os.cpu_count(), "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": {}}
+        tmp = tempfile.mkdtemp()
+        try:
+            for mode in args.modes.split(","):
+                for case, result in run_mode(tmp, mode, args).items():
+                    run["results"][f"{mode}/{case}"] = result
+        finally:
+            shutil.rmtree(tmp)
+        run["peak_rss_kib"] = peak_rss_kib()
+        if args.out:
+            with open(args.out, "w") as out_file:
+                json.dump(run, out_file, indent=2)
+        elif not args.compare:
+            print(json.dumps(run, indent=2))
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("params") != run.get("params"):
+            print(f"Warning : the runs used different params {baseline.get('params')} / {run.get('params')}")
+        regressions = compare(baseline, run, args.threshold)
+        print(f"{len(regressions)} regressions over {args.threshold:.0%}" if regressions else "No regressions")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from OSOME_DB import OsomeDB
+
+
+@pytest.mark.parametrize("storage", ["blob", "log", "paged", "mmap"])
+def test_chained_backups_stay_point_in_time(tmp_path, storage):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C", storage=storage)
+    db.append_docs("C", [{"a": i} for i in range(10)])
+    b1, b2 = str(tmp_path / "b1"), str(tmp_path / "b2")
+    db.snapshot(b1)
+    db.backup_incremental(b2, since=b1)
+    db.append_docs("C", [{"a": 99}])
+    db.backup_incremental(b1)
+    assert OsomeDB(b1).load_collection("C")[-1] == {"a": 99}
+    assert OsomeDB(b2).load_collection("C") == [{"a": i} for i in range(10)]
+
+
+def test_shared_log_copy_is_not_changed_in_place(tmp_path):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("L", storage="log")
+    db.append_docs("L", [{"a": 1}])
+    b1 = str(tmp_path / "b1")
+    db.snapshot(b1)
+    # A link left by an older backup
+    os.link(os.path.join(b1, "L"), str(tmp_path / "other"))
+    db.append_docs("L", [{"a": 2}])
+    db.backup_incremental(b1)
+    assert OsomeDB(b1).load_collection("L") == [{"a": 1}, {"a": 2}]
+    assert os.path.getsize(str(tmp_path / "other")) < os.path.getsize(os.path.join(b1, "L"))
@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+from OSOME_DB import OsomeDB
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_idle_cached_handle_is_flushed(tmp_path):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C")
+    collection = db.get_collection("C", cache=True, flush_interval=0.1)
+    collection += {"a": 1}
+    deadline = time.monotonic() + 5
+    while db.load_collection("C") != [{"a": 1}] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert db.load_collection("C") == [{"a": 1}]
+
+
+def test_unflushed_docs_are_written_at_exit(tmp_path):
+    path = str(tmp_path / "DB")
+    script = textwrap.dedent(f"""
+        from OSOME_DB import OsomeDB
+        db = OsomeDB({path!r})
+        db.make_collection("C")
+        collection = db.get_collection("C", cache=True, flush_interval=3600)
+        collection += {{"a": 1}}
+    """)
+    subprocess.run([sys.executable, "-c", script], check=True, env=dict(os.environ, PYTHONPATH=ROOT))
+    assert OsomeDB(path).load_collection("C") == [{"a": 1}]
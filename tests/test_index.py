@@ -0,0 +1,33 @@
+import pytest
+
+from OSOME_DB import OsomeDB
+
+
+@pytest.mark.parametrize("storage", ["blob", "log", "paged", "mmap"])
+def test_cached_index_follows_writes(tmp_path, storage):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C", storage=storage)
+    db.append_docs("C", [{"id": i} for i in range(50)])
+    db.create_index("C", "id")
+    collection = db.get_collection("C")
+    assert collection.search_by_key_val("id", 7) == (7, {"id": 7})
+    assert collection.search_by_key_val("id", 70) is None
+    db.append_docs("C", [{"id": 70}])
+    db.delete_docs("C", [0])
+    assert collection.search_by_key_val("id", 70) == (49, {"id": 70})
+    assert collection.search_by_key_val("id", 7) == (6, {"id": 7})
+    # A write made through another DB obj (another process) is seen too
+    other = OsomeDB.__new__(OsomeDB)
+    other.__init__(str(tmp_path / "DB"))
+    other.append_docs("C", [{"id": 71}])
+    assert collection.search_by_key_val("id", 71) == (50, {"id": 71})
+
+
+def test_count_and_find_agree_on_equal_values(tmp_path):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C")
+    collection = db.get_collection("C")
+    collection.insert_many([{"id": 1}, {"id": True}, {"id": 1.0}, {"id": 3}])
+    db.create_index("C", "id")
+    assert collection.count({"id": 1}) == len(collection.find({"id": 1})) == 3
+    assert collection.count({"id": {"$eq": 3, "$lt": 2}}) == len(collection.find({"id": {"$eq": 3, "$lt": 2}})) == 0
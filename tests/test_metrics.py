@@ -0,0 +1,26 @@
+import pytest
+
+from OSOME_DB import OsomeDB
+
+
+@pytest.mark.parametrize("storage", ["blob", "log", "paged", "mmap"])
+def test_every_storage_records_its_stages(tmp_path, storage):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C", storage=storage)
+    metrics = db.enable_metrics()
+
+    db.append_docs("C", [{"a": i} for i in range(50)])
+    db.replace_doc("C", 3, {"a": -3})
+    written = metrics.snapshot()
+    for stage in ("serialize", "write"):
+        assert written["timings"][stage]["C"]["count"] > 0, stage
+    assert written["counters"]["bytes_written"]["C"] > 0
+
+    metrics.reset()
+    assert db.load_collection("C")[3] == {"a": -3}
+    assert len(list(db.iter_collection("C"))) == 50
+    assert db.get_doc("C", 10) == {"a": 10}
+    read = metrics.snapshot()
+    for stage in ("read", "parse"):
+        assert read["timings"][stage]["C"]["count"] > 0, stage
+    assert read["counters"]["bytes_read"]["C"] > 0
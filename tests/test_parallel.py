@@ -0,0 +1,26 @@
+import threading
+
+import OSOME_DB
+from OSOME_DB import OsomeDB
+
+
+def test_find_all_keeps_page_chunks_valid(tmp_path, monkeypatch):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("P", storage="paged")
+    db.append_docs("P", [{"a": i} for i in range(1000)])
+    db.replace_doc("P", 0, {"a": 0})
+    find_task = OSOME_DB._find_task
+    compacting = []
+
+    def racing_task(*args):
+        if not compacting:
+            # A compaction between the directory read and the worker's open moves the pages
+            compacting.append(threading.Thread(target=db.compact_collection, args=("P",)))
+            compacting[0].start()
+            compacting[0].join(0.2)
+        return find_task(*args)
+
+    monkeypatch.setattr(OSOME_DB, "_find_task", racing_task)
+    found = db.find_all({"a": {"$gte": 0}}, collections=["P"], pool="thread")
+    compacting[0].join()
+    assert found == {"P": [{"a": i} for i in range(1000)]}
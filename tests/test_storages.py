@@ -0,0 +1,168 @@
+import json
+import os
+
+import pytest
+
+from OSOME_DB import OsomeDB, LOG_HEADER, LOG_INSERT, PAGE_MAGIC, PAGE_SLOT
+
+
+def reopen(path):
+    # A fresh DB obj runs the recovery a new process would
+    db = OsomeDB.__new__(OsomeDB)
+    db.__init__(path)
+    return db
+
+
+def test_log_torn_append_is_dropped(tmp_path):
+    path = str(tmp_path / "DB")
+    db = OsomeDB(path)
+    db.make_collection("L", storage="log")
+    db.append_docs("L", [{"a": i} for i in range(5)])
+    size = os.path.getsize(os.path.join(path, "L"))
+    payload = db._log_record(LOG_INSERT, 0, {"a": 5})[LOG_HEADER.size:]
+    with open(os.path.join(path, "L"), "ab") as db_file:
+        # The header reached the disk , the payload did not
+        db_file.write(db._log_record(LOG_INSERT, 0, {"a": 5})[:LOG_HEADER.size] + b"\x00" * len(payload))
+    assert db.load_collection("L") == [{"a": i} for i in range(5)]
+    db = reopen(path)
+    assert os.path.getsize(os.path.join(path, "L")) == size
+    db.append_docs("L", [{"a": 5}])
+    assert db.load_collection("L") == [{"a": i} for i in range(6)]
+
+
+def test_paged_torn_commit_falls_back(tmp_path):
+    path = str(tmp_path / "DB")
+    db = OsomeDB(path)
+    db.make_collection("P", storage="paged")
+    db.append_docs("P", [{"a": i} for i in range(300)])
+    file_path = os.path.join(path, "P")
+    end = os.path.getsize(file_path)
+    db.append_docs("P", [{"a": 300}])
+    with open(file_path, "r+b") as db_file:
+        # The flip reached the disk , the new page did not
+        db_file.seek(end)
+        db_file.write(b"\x00" * 16)
+    db = reopen(path)
+    assert db.load_collection("P") == [{"a": i} for i in range(300)]
+    assert os.path.getsize(file_path) == end
+    db.append_docs("P", [{"a": 300}])
+    assert db.load_collection("P") == [{"a": i} for i in range(301)]
+
+
+def test_paged_torn_directory_falls_back(tmp_path):
+    path = str(tmp_path / "DB")
+    db = OsomeDB(path)
+    db.make_collection("P", storage="paged")
+    db.append_docs("P", [{"a": i} for i in range(10)])
+    db.append_docs("P", [{"a": 10}])
+    file_path = os.path.join(path, "P")
+    with open(file_path, "r+b") as db_file:
+        db_file.seek(len(PAGE_MAGIC))
+        active = db_file.read(1)[0]
+        offset, length, crc = PAGE_SLOT.unpack(db_file.read(2 * PAGE_SLOT.size)[active * PAGE_SLOT.size:][:PAGE_SLOT.size])
+        db_file.seek(offset)
+        db_file.write(b"\x00" * length)
+    assert db.load_collection("P") == [{"a": i} for i in range(10)]
+    db = reopen(path)
+    assert db.load_collection("P") == [{"a": i} for i in range(10)]
+
+
+def test_stream_parses_a_big_doc_a_few_times(tmp_path):
+    db = OsomeDB(str(tmp_path / "DB"))
+    metrics = db.enable_metrics()
+    docs = [{"a": 1}, {"big": "x" * (1 << 20)}, 2.5, {"b": [1, 2]}]
+    text = json.dumps(docs)
+    chunks = (text[e:e + 1024] for e in range(0, len(text), 1024))
+    assert list(db._iter_json_array(chunks, "C")) == docs
+    # About a thousand chunks , the big doc is only tried again each time the buffer doubled
+    assert metrics.snapshot()["timings"]["parse"]["C"]["count"] < 30
+
+
+def test_small_blob_iterates_with_one_parse(tmp_path):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C")
+    db.append_docs("C", [{"a": i} for i in range(1000)])
+    metrics = db.enable_metrics()
+    assert list(db.iter_collection("C")) == [{"a": i} for i in range(1000)]
+    assert metrics.snapshot()["timings"]["parse"]["C"]["count"] == 1
+
+
+@pytest.mark.parametrize("storage", ["log", "paged"])
+def test_round_trip(tmp_path, storage):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C", storage=storage)
+    db.append_docs("C", [{"a": i} for i in range(300)])
+    db.replace_doc("C", 5, {"a": -5})
+    db.delete_docs("C", [0, 299])
+    db.append_docs("C", [{"a": 300}])
+    expected = [{"a": -5 if i == 5 else i} for i in range(1, 299)] + [{"a": 300}]
+    assert db.load_collection("C") == expected
+    assert list(db.iter_collection("C")) == expected
+    assert db.get_doc("C", 4) == {"a": -5}
+    assert db.count_docs("C") == len(expected)
+    assert reopen(db.db_path).load_collection("C") == expected
+
+
+@pytest.mark.parametrize("storage", ["log", "paged"])
+def test_reopen_after_truncation(tmp_path, storage):
+    path = str(tmp_path / "DB")
+    db = OsomeDB(path)
+    db.make_collection("C", storage=storage)
+    db.append_docs("C", [{"a": i} for i in range(20)])
+    db.append_docs("C", [{"a": 20}])
+    file_path = os.path.join(path, "C")
+    # A crash in the middle of the last commit
+    os.truncate(file_path, os.path.getsize(file_path) - 3)
+    db = reopen(path)
+    assert db.load_collection("C") == [{"a": i} for i in range(20)]
+    db.append_docs("C", [{"a": 20}])
+    db.replace_doc("C", 0, {"a": 0})
+    assert reopen(path).load_collection("C") == [{"a": i} for i in range(21)]
+
+
+@pytest.mark.parametrize("storage", ["log", "paged"])
+def test_compaction(tmp_path, storage):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C", storage=storage)
+    db.append_docs("C", [{"a": i} for i in range(100)])
+    for i in range(20):
+        db.replace_doc("C", i, {"a": i, "v": 2})
+    db.delete_docs("C", list(range(50, 60)))
+    expected = db.load_collection("C")
+    file_path = os.path.join(db.db_path, "C")
+    size = os.path.getsize(file_path)
+    db.compact_collection("C")
+    assert os.path.getsize(file_path) < size
+    assert db.load_collection("C") == expected
+    assert db.get_doc("C", 60) == expected[60]
+    db.delete_doc("C", 0)
+    assert db.load_collection("C") == expected[1:]
+
+
+def test_log_table_follows_other_handles(tmp_path):
+    path = str(tmp_path / "DB")
+    db = OsomeDB(path)
+    db.make_collection("L", storage="log")
+    db.append_docs("L", [{"a": i} for i in range(10)])
+    assert db.get_doc("L", 9) == {"a": 9}
+    other = reopen(path)
+    other.append_docs("L", [{"a": 10}])
+    other.delete_doc("L", 0)
+    assert db.get_doc("L", 9) == {"a": 10}
+    assert db.count_docs("L") == 10
+    db.append_docs("L", [{"a": 11}])
+    assert other.load_collection("L") == [{"a": i} for i in range(1, 12)]
+
+
+def test_raw_write_bumps_the_generation(tmp_path):
+    db = OsomeDB(str(tmp_path / "DB"))
+    db.make_collection("C")
+    db.write_collection("C", [{"a": 1}])
+    generation = db.generation("C")
+    assert db.count_docs("C") == 1
+    db.write_collection_raw("C", json.dumps([{"a": 1}, {"a": 2}]))
+    assert db.generation("C") == generation + 1
+    assert db.count_docs("C") == 2
+    assert db.generation("C") == generation + 1
+    db.write_collection("C", [])
+    assert db.generation("C") == generation + 2